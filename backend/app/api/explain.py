@@ -1,6 +1,10 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from app.services.llm import generate_explanation
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app.services.llm import generate_explanation, generate_batch_explanations, pack_questions, stream_explanation
+from app.services import explanation_cache
 
 router = APIRouter()
 
@@ -13,17 +17,134 @@ class ExplainRequest(BaseModel):
 class ExplainResponse(BaseModel):
     explanation: str
 
+# A full mock test in one request
+MAX_BATCH_QUESTIONS = 100
+
+class ExplainBatchRequest(BaseModel):
+    questions: list[ExplainRequest] = Field(min_length=1, max_length=MAX_BATCH_QUESTIONS)
+
+class BatchExplanation(BaseModel):
+    question_id: str
+    explanation: str
+    cached: bool
+
+class ExplainBatchResponse(BaseModel):
+    explanations: list[BatchExplanation]
+
 @router.post("/explain", response_model=ExplainResponse)
 async def explain_question(request: ExplainRequest):
     """
     Get an AI-generated explanation for a specific question.
+    Explanations are cached, and concurrent requests for the same question share one Gemini call.
     """
     try:
-        explanation = generate_explanation(
-            request.question_text, 
-            options=request.options, 
+        key = explanation_cache.make_key(
+            request.question_id,
+            request.question_text,
+            options=request.options,
             correct_answer=request.correct_answer
         )
+        explanation = await explanation_cache.get_or_generate(
+            key,
+            request.question_id,
+            lambda: generate_explanation(
+                request.question_text,
+                options=request.options,
+                correct_answer=request.correct_answer
+            )
+        )
         return {"explanation": explanation}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/explain/batch", response_model=ExplainBatchResponse)
+async def explain_questions_batch(request: ExplainBatchRequest):
+    """
+    Explanations for many questions at once, e.g. a whole mock test, in request order.
+    Cached questions are answered from the cache; the rest are packed several to a
+    Gemini call with JSON output and split back out per question. A question that
+    failed has an explanation starting with "Error" and is not cached.
+    """
+    questions = {}
+    keys = []
+    for question in request.questions:
+        key = explanation_cache.make_key(
+            question.question_id,
+            question.question_text,
+            options=question.options,
+            correct_answer=question.correct_answer
+        )
+        # Repeats of the same question are explained once
+        questions.setdefault(key, question)
+        keys.append(key)
+
+    def payload(key):
+        question = questions[key]
+        return {"question_text": question.question_text, "options": question.options, "correct_answer": question.correct_answer}
+
+    def pack(todo):
+        return [[todo[i] for i in indexes] for indexes in pack_questions([payload(key) for key in todo])]
+
+    try:
+        results = await explanation_cache.get_or_generate_many(
+            {key: question.question_id for key, question in questions.items()},
+            lambda pack_keys: generate_batch_explanations([payload(key) for key in pack_keys]),
+            pack,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "explanations": [
+            {"question_id": question.question_id, "explanation": results[key][0], "cached": results[key][1]}
+            for question, key in zip(request.questions, keys)
+        ]
+    }
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@router.post("/explain/stream")
+async def explain_question_stream(request: ExplainRequest):
+    """
+    Same as /explain, but streams the explanation as Server-Sent Events.
+    Each chunk arrives as {"text": ...}; the stream ends with a `done` event,
+    or an `error` event if Gemini fails. The full text is cached once complete.
+    """
+    key = explanation_cache.make_key(
+        request.question_id,
+        request.question_text,
+        options=request.options,
+        correct_answer=request.correct_answer
+    )
+
+    async def events():
+        try:
+            cached = await explanation_cache.lookup(key)
+            if cached is None and explanation_cache.pending(key) is not None:
+                # A non-streaming request is already generating this one
+                cached = await asyncio.shield(explanation_cache.pending(key))
+            if cached is not None:
+                yield _sse({"text": cached})
+                yield _sse({"cached": True}, event="done")
+                return
+
+            parts = []
+            async for chunk in stream_explanation(
+                request.question_text,
+                options=request.options,
+                correct_answer=request.correct_answer
+            ):
+                parts.append(chunk)
+                yield _sse({"text": chunk})
+            await explanation_cache.save(key, request.question_id, "".join(parts))
+            yield _sse({"cached": False}, event="done")
+        except Exception as e:
+            yield _sse({"detail": f"Error generating explanation: {e}"}, event="error")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
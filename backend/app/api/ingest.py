@@ -1,10 +1,7 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
 import shutil
 import os
-import PyPDF2
-from app.services.pdf_parser import extract_text_from_pdf, parse_questions_from_text
-from app.services.search_engine import add_documents
+from app.services import ingest_jobs, metrics
 
 router = APIRouter()
 
@@ -12,38 +9,32 @@ UPLOAD_DIR = "uploaded_pdfs"
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
-@router.post("/ingest")
+@router.post("/ingest", status_code=202)
 async def ingest_pdf(file: UploadFile = File(...)):
     """
-    Upload a PDF, parse it, and index the questions.
+    Upload a PDF and queue it for parsing and indexing.
+    Returns a job ID to poll at /ingest/jobs/{job_id}.
     """
     try:
-        file_location = f"{UPLOAD_DIR}/{file.filename}"
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-            
-        # Parse PDF
-        with open(file_location, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            text = extract_text_from_pdf(reader)
-            
-        questions = parse_questions_from_text(text)
-        
-        # Prepare for Indexing
-        documents = []
-        for q in questions:
-            documents.append({
-                "id": f"{file.filename}_{q.id}",
-                "content": q.text,
-                "tags": ",".join(q.tags),
-                "year": "2023", # Placeholder, would come from metadata
-                "subject": q.subject
-            })
-            
-        # Index
-        add_documents(documents)
-        
-        return {"filename": file.filename, "questions_processed": len(questions)}
+        # Saved under the job id: a second upload with the same name must not overwrite a queued file
+        job_id = ingest_jobs.new_job_id()
+        file_location = f"{UPLOAD_DIR}/{job_id}.pdf"
+        with metrics.ingest_stage_seconds.time(stage="upload_save"):
+            with open(file_location, "wb+") as file_object:
+                shutil.copyfileobj(file.file, file_object)
+
+        job = ingest_jobs.enqueue(file.filename, file_location, job_id=job_id)
+        return {"job_id": job.id, "filename": file.filename, "status": job.status}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/ingest/jobs/{job_id}")
+def ingest_job_status(job_id: str):
+    """
+    Progress of an ingestion job: pages done, questions found and indexed, and errors.
+    """
+    job = ingest_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
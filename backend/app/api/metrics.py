@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    """
+    Prometheus text exposition of the search, ingest and Gemini metrics.
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from app.api.search import SearchResult, parse_fields
+from app.core.responses import FastJSONResponse
+from app.services.search_engine import get_question, RESULT_FIELDS
+
+router = APIRouter()
+
+@router.get("/questions/{question_id}", response_model=SearchResult)
+def read_question(question_id: str, fields: Optional[str] = None):
+    """
+    Full stored fields of one question (content, options, answer, explanation, appearances),
+    looked up by id without running a search.
+    """
+    question = get_question(question_id, parse_fields(fields, default=RESULT_FIELDS))
+    if question is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return FastJSONResponse(question)
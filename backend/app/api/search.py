@@ -1,32 +1,113 @@
-from fastapi import APIRouter, Query
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Dict, Literal, Optional
 from pydantic import BaseModel
-from app.services.search_engine import search_index
+from app.core.responses import FastJSONResponse
+from app.services import metrics
+from app.services.search_engine import search_page, empty_page, index_is_empty, RESULT_FIELDS, DEFAULT_RESULT_FIELDS
+from app.services.query_cache import search_cache
+from app.services.suggest import suggest_index, SUGGEST_LIMIT, MAX_SUGGEST_LIMIT
 
 router = APIRouter()
 
 class SearchResult(BaseModel):
     id: str
-    content: str
-    score: float
+    score: float = None
+    # Highlighted fragments of content (HTML-escaped, matches in <mark>)
+    snippet: str = None
+    content: str = None
     subject: str = None
     year: str = None
     tags: str = None
     options: list = None
     correct_answer: str = None
     explanation: str = None
+    source: str = None
+    # Every paper/year this question appeared in, including merged near-duplicates
+    appearances: list = None
 
-@router.get("/search", response_model=List[SearchResult])
-def search_questions(q: str = Query(..., min_length=3)):
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    total: int
+    page: int
+    page_size: int
+    # facet field -> value -> hit count, e.g. {"subject": {"Physics": 1204}}
+    facets: Dict[str, Dict[str, int]] = {}
+
+def parse_fields(fields: Optional[str], default=DEFAULT_RESULT_FIELDS) -> tuple:
+    """
+    Comma-separated field names -> tuple of RESULT_FIELDS, always including id.
+    """
+    if not fields:
+        return tuple(default)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in RESULT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(RESULT_FIELDS)}")
+    return tuple(f for f in RESULT_FIELDS if f == "id" or f in requested)
+
+@router.get("/search", response_model=SearchResponse)
+def search_questions(
+    q: str = Query(..., min_length=3),
+    subject: Optional[str] = None,
+    year: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50),
+    mode: Literal["bm25", "hybrid"] = "bm25",
+    fields: Optional[str] = Query(None, description="Comma-separated fields per hit; defaults to " + ",".join(DEFAULT_RESULT_FIELDS)),
+):
+    """
+    Search for questions using Whoosh index, optionally filtered by subject/year.
+    mode=hybrid also ranks by embedding similarity, for conceptual queries.
+    Hits carry a highlighted snippet instead of the full question; fetch
+    /questions/{id} for the rest, or name extra fields in fields=.
+    """
+    projection = parse_fields(fields)
+    filters = {"subject": subject, "year": year}
+    key = search_cache.make_key(q, page=page, page_size=page_size, mode=mode, fields=projection, **filters)
+    response = search_cache.get(key)
+    if response is None:
+        try:
+            response = search_page(q, page=page, page_size=page_size, filters=filters, mode=mode, fields=projection,
+                                   raise_errors=True)
+        except Exception:
+            # Already logged by search_page; an error page must not be cached
+            response = empty_page(page, page_size)
+        else:
+            search_cache.put(key, response)
+    # Mock data while nothing has been indexed yet (for verifying the frontend); a
+    # filtered search with no hits is a real empty result
+    if not response["results"] and page == 1 and not subject and not year and index_is_empty():
+        response = {
+            **response,
+            "results": [
+                {"id": "1", "content": "Explain the process of Glycolysis. (Biology, 2023)", "score": 1.0},
+                {"id": "2", "content": "Calculate the angular momentum of an electron. (Physics, 2022)", "score": 0.9},
+                {"id": "3", "content": "What is the IUPAC name of the compound? (Chemistry, 2024)", "score": 0.85},
+            ],
+        }
+    # Hits are plain dicts built from stored fields, so they skip response_model validation
+    with metrics.search_stage_seconds.time(stage="serialize"):
+        return FastJSONResponse(response)
+
+class Suggestion(BaseModel):
+    text: str
+    # Documents containing the completed word
+    weight: int
+
+@router.get("/suggest", response_model=List[Suggestion])
+def suggest(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SUGGEST_LIMIT, ge=1, le=MAX_SUGGEST_LIMIT),
+):
+    """
+    Typeahead completions of the last word of q from the indexed vocabulary,
+    most common first. Served from an in-memory prefix index; no search is run.
+    """
+    return FastJSONResponse(suggest_index.suggest(q, limit))
+
+@router.get("/search/cache")
+def search_cache_stats():
     """
-    Search for questions using Whoosh index.
+    Hit/miss counters for the search result cache.
     """
-    results = search_index(q)
-    # Mock data if index is empty (for verifying frontend)
-    if not results:
-        return [
-            {"id": "1", "content": "Explain the process of Glycolysis. (Biology, 2023)", "score": 1.0},
-            {"id": "2", "content": "Calculate the angular momentum of an electron. (Physics, 2022)", "score": 0.9},
-            {"id": "3", "content": "What is the IUPAC name of the compound? (Chemistry, 2024)", "score": 0.85},
-        ]
-    return results
+    return search_cache.stats()
@@ -0,0 +1,72 @@
+from typing import Sequence
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# orjson and brotli are optional: without them responses fall back to the
+# standard json module and gzip
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESS_MINIMUM_SIZE = 500
+GZIP_LEVEL = 6
+# Brotli quality 4 compresses JSON better than gzip -6 at similar CPU cost
+BROTLI_QUALITY = 4
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = BROTLI_QUALITY) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        body = self.compressor.process(body)
+        if not more_body:
+            body += self.compressor.finish()
+        return body
+
+
+def _accepted_encodings(headers: Headers) -> set:
+    return {
+        part.split(";")[0].strip().lower()
+        for part in headers.get("Accept-Encoding", "").split(",")
+    }
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when installed) or gzip compression for responses under the given path
+    prefixes, picked from the client's Accept-Encoding. Event streams and responses
+    that already carry a Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Sequence[str], minimum_size: int = COMPRESS_MINIMUM_SIZE) -> None:
+        self.app = app
+        self.paths = tuple(paths)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        encodings = _accepted_encodings(Headers(scope=scope))
+        if brotli is not None and "br" in encodings:
+            responder = BrotliResponder(self.app, self.minimum_size)
+        elif "gzip" in encodings:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=GZIP_LEVEL)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Column, JSON
+from sqlmodel import SQLModel, Field
+
+
+class Question(SQLModel, table=True):
+    """
+    Source of truth for every ingested question, near-duplicates included.
+    The Whoosh index is derived from this table and can be rebuilt from it.
+    """
+    id: str = Field(primary_key=True)
+    content: str
+    tags: Optional[str] = None
+    year: Optional[str] = Field(default=None, index=True)
+    subject: Optional[str] = Field(default=None, index=True)
+    options: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    correct_answer: Optional[object] = Field(default=None, sa_column=Column(JSON))  # text or list of keys
+    explanation: Optional[str] = None
+    source: Optional[str] = Field(default=None, index=True)  # uploaded file or paper set
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CachedExplanation(SQLModel, table=True):
+    """
+    A generated explanation, keyed by question ID plus a hash of the question
+    text, options and correct answer so edited questions are explained again.
+    """
+    key: str = Field(primary_key=True)
+    question_id: str = Field(index=True)
+    explanation: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CachedOcrResult(SQLModel, table=True):
+    """
+    Parsed Gemini OCR output for one image, keyed by a hash of the image pixels
+    plus the OCR model and prompt version, so only a model or prompt change
+    sends an image to Gemini again.
+    """
+    key: str = Field(primary_key=True)
+    image_hash: str = Field(index=True)
+    image_path: Optional[str] = Field(default=None, index=True)
+    model: str
+    prompt_version: str
+    result: dict = Field(sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class IngestJob(SQLModel, table=True):
+    """
+    A queued PDF upload. Workers claim queued jobs and report progress here,
+    so the queue survives restarts.
+    """
+    id: str = Field(primary_key=True)
+    filename: str
+    path: str
+    status: str = Field(default="queued", index=True)  # queued, running, done, failed
+    pages_total: int = 0
+    pages_done: int = 0
+    questions_found: int = 0
+    questions_indexed: int = 0
+    errors: list[str] = Field(default_factory=list, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
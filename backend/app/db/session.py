@@ -1,11 +1,50 @@
+import threading
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy.exc import OperationalError
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=True)
+# Used when DATABASE_URL is unreachable and DB_SQLITE_FALLBACK is set (local dev, scripts)
+LOCAL_DATABASE_URL = "sqlite:///pyq_local.db"
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,  # drop connections the server closed while idle
+    pool_recycle=1800,
+)
+_active_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Returns the configured engine. If the database cannot be reached this raises,
+    unless DB_SQLITE_FALLBACK allows a local SQLite engine instead.
+    Tables are created on first use.
+    """
+    global _active_engine
+    with _engine_lock:
+        if _active_engine is None:
+            from app.db import models  # noqa: F401 - registers the tables
+            try:
+                with engine.connect():
+                    pass
+                candidate = engine
+            except OperationalError as e:
+                reason = str(e.orig).strip().splitlines()[0]
+                if not settings.DB_SQLITE_FALLBACK:
+                    print(f"Database unavailable ({reason}); set DB_SQLITE_FALLBACK=true to use {LOCAL_DATABASE_URL} locally")
+                    raise
+                print(f"Database unavailable ({reason}), falling back to {LOCAL_DATABASE_URL}")
+                candidate = create_engine(LOCAL_DATABASE_URL, echo=settings.DB_ECHO, connect_args={"check_same_thread": False})
+            SQLModel.metadata.create_all(candidate)
+            _active_engine = candidate
+        return _active_engine
 
 def get_session():
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine())
@@ -1,7 +1,44 @@
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import settings
+from app.core.responses import FastJSONResponse, CompressionMiddleware
 
-app = FastAPI(title="PYQ Question Bank API", version="1.0.0")
+def warm_up():
+    """
+    Loads the heavy dependencies that ingest and explain need, off the request path.
+    """
+    try:
+        from app.services.pdf_parser import get_nlp
+        get_nlp()
+        if settings.GEMINI_API_KEY:
+            from app.services.llm import get_client
+            get_client()
+    except Exception as e:
+        print(f"Warm-up failed, models will load on first use: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the typeahead and facet indexes before the first keystroke and search need them
+    from app.services.suggest import suggest_index
+    from app.services.search_engine import facet_index
+    suggest_index.start_rebuild()
+    facet_index.start_rebuild()
+
+    if settings.SEARCH_ONLY:
+        yield
+        return
+
+    # Background workers that parse and index uploaded PDFs
+    from app.services import ingest_jobs
+    ingest_jobs.start_workers()
+    if settings.WARMUP_MODELS:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
+    ingest_jobs.stop_workers()
+
+app = FastAPI(title="PYQ Question Bank API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS Configuration
 origins = [
@@ -17,10 +54,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.api import search, ingest, explain
+# Result pages are the large, repetitive JSON bodies worth compressing
+app.add_middleware(CompressionMiddleware, paths=["/api/v1/search", "/api/v1/questions"])
+
+from app.api import search, questions, metrics
 app.include_router(search.router, prefix="/api/v1")
-app.include_router(ingest.router, prefix="/api/v1")
-app.include_router(explain.router, prefix="/api/v1")
+app.include_router(questions.router, prefix="/api/v1")
+# Prometheus scrapes /metrics at the root, outside the versioned API
+app.include_router(metrics.router)
+# Read-only search replicas skip ingest/explain, and with them spaCy, PyPDF2 and Gemini
+if not settings.SEARCH_ONLY:
+    from app.api import ingest, explain
+    app.include_router(ingest.router, prefix="/api/v1")
+    app.include_router(explain.router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,202 @@
+import os
+import re
+import zlib
+import threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# 128 MinHash permutations split into 16 LSH bands of 8 rows: pairs above ~0.7
+# Jaccard similarity almost always share a band; candidates are then confirmed
+# against DEDUP_THRESHOLD on the full signature and must quote the same numbers
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 5  # characters
+# v2 records carry the numbers fingerprint; v1 files (no fingerprint) are ignored until the next rebuild
+SIGNATURES_NAME = "minhash_v2"
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32, with odd a
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase, punctuation-free, single-spaced text, so OCR and PDF-extraction
+    differences in spacing and punctuation do not hide a duplicate.
+    """
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def numbers_fingerprint(text: str) -> int:
+    """
+    Hash of the numbers a question quotes (values, options), in sorted order.
+    Two questions that differ only in their numbers are different questions,
+    however similar their wording, so a merge needs equal fingerprints.
+    """
+    return zlib.crc32(" ".join(sorted(_NUMBER.findall(text or ""))).encode("utf-8"))
+
+
+def signature(text: str) -> np.ndarray:
+    """
+    MinHash signature over the character shingles of the normalized text.
+    """
+    text = normalize_text(text)
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def _bands(sig: np.ndarray):
+    rows = sig.reshape(LSH_BANDS, LSH_ROWS)
+    return [(band, rows[band].tobytes()) for band in range(LSH_BANDS)]
+
+
+# One fixed-size record per canonical question: its id (NUL-padded), numbers fingerprint and signature
+RECORD = np.dtype([("id", "S128"), ("numbers", "<u4"), ("sig", "<u4", NUM_PERM)])
+
+
+class _Buckets:
+    def __init__(self):
+        self.ids: List[str] = []
+        self.id_set = set()
+        self.numbers: List[int] = []
+        self.signatures: List[np.ndarray] = []
+        self.buckets: Dict[tuple, List[int]] = {}
+
+    def add(self, doc_id: str, sig: np.ndarray, numbers: int):
+        row = len(self.ids)
+        self.ids.append(doc_id)
+        self.id_set.add(doc_id)
+        self.numbers.append(numbers)
+        self.signatures.append(sig)
+        for key in _bands(sig):
+            self.buckets.setdefault(key, []).append(row)
+
+    def match(self, sig: np.ndarray, numbers: int, exclude: Optional[str] = None):
+        """
+        (id, estimated Jaccard similarity) of the closest question at or above
+        DEDUP_THRESHOLD that quotes the same numbers.
+        """
+        best, best_similarity = None, DEDUP_THRESHOLD
+        seen = set()
+        for key in _bands(sig):
+            for row in self.buckets.get(key, ()):
+                if row in seen:
+                    continue
+                seen.add(row)
+                if self.numbers[row] != numbers:
+                    continue
+                similarity = float(np.mean(self.signatures[row] == sig))
+                if similarity >= best_similarity and self.ids[row] != exclude:
+                    best, best_similarity = self.ids[row], similarity
+        return best, best_similarity
+
+
+class DedupIndex:
+    """
+    LSH buckets over the MinHash signatures of every canonical question, so checking
+    a new question costs a few dictionary lookups whatever the corpus size.
+    Signatures are appended to <index_dir>/<SIGNATURES_NAME>.sig as fixed-size records, one
+    write per batch, and each process reads the records other processes appended
+    before it checks anything.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._known = _Buckets()
+        self._records_read = 0
+        self._file_id = None
+
+    def _path(self):
+        return os.path.join(self.index_dir, SIGNATURES_NAME + ".sig")
+
+    def _catch_up(self):
+        path = self._path()
+        if not os.path.exists(path):
+            self._known, self._records_read, self._file_id = _Buckets(), 0, None
+            return
+        stat = os.stat(path)
+        file_id = (stat.st_ino, stat.st_dev)
+        if file_id != self._file_id or stat.st_size < self._records_read * RECORD.itemsize:
+            self._known, self._records_read, self._file_id = _Buckets(), 0, file_id
+        available = stat.st_size // RECORD.itemsize
+        if available == self._records_read:
+            return
+        records = np.fromfile(path, dtype=RECORD, count=available - self._records_read,
+                              offset=self._records_read * RECORD.itemsize)
+        for record in records:
+            self._known.add(record["id"].decode("utf-8"), record["sig"], int(record["numbers"]))
+        self._records_read += len(records)
+
+    def find_duplicate(self, text: str, exclude: Optional[str] = None) -> Optional[str]:
+        """
+        Id of an indexed canonical question whose text is a near-duplicate of text, if any.
+        """
+        sig = signature(text)
+        with self._lock:
+            self._catch_up()
+            return self._known.match(sig, numbers_fingerprint(text), exclude)[0]
+
+    def assign(self, documents: Sequence[dict], signatures: Optional[Sequence[np.ndarray]] = None) -> Dict[str, str]:
+        """
+        Maps the id of every document in the batch that duplicates an indexed question,
+        or an earlier document in the batch, to its canonical id. The remaining
+        documents become canonical and their signatures are recorded.
+        signatures: precomputed signature(doc["content"]) per document, e.g. from worker processes.
+        """
+        duplicates = {}
+        batch = _Buckets()
+        with self._lock:
+            self._catch_up()
+            for position, doc in enumerate(documents):
+                doc_id = str(doc["id"])
+                # Re-indexing a canonical question is an update, not a duplicate
+                if doc_id in duplicates or doc_id in batch.id_set or doc_id in self._known.id_set:
+                    continue
+                content = doc.get("content") or ""
+                sig = signatures[position] if signatures is not None else signature(content)
+                numbers = numbers_fingerprint(content)
+                candidates = [self._known.match(sig, numbers, exclude=doc_id), batch.match(sig, numbers, exclude=doc_id)]
+                canonical, _ = max(candidates, key=lambda c: c[1] if c[0] else -1.0)
+                if canonical is not None:
+                    duplicates[doc_id] = canonical
+                elif len(doc_id.encode("utf-8")) <= RECORD["id"].itemsize:
+                    batch.add(doc_id, sig, numbers)
+
+            if batch.ids:
+                records = np.zeros(len(batch.ids), dtype=RECORD)
+                records["id"] = [i.encode("utf-8") for i in batch.ids]
+                records["numbers"] = batch.numbers
+                records["sig"] = np.stack(batch.signatures)
+                os.makedirs(self.index_dir, exist_ok=True)
+                # A single append per batch keeps records whole when several processes ingest at once
+                with open(self._path(), "ab") as f:
+                    f.write(records.tobytes())
+                self._catch_up()
+        return duplicates
+
+    def reset(self):
+        with self._lock:
+            if os.path.exists(self._path()):
+                os.remove(self._path())
+            self._catch_up()
+
+
+def signatures_for(texts: Sequence[str]) -> List[np.ndarray]:
+    return [signature(text or "") for text in texts]
+
+
+def appearance(doc: dict) -> dict:
+    """
+    Where a copy of a question was seen: its own id, the paper/file it came from and the year.
+    """
+    return {"id": str(doc["id"]), "source": doc.get("source"), "year": doc.get("year")}
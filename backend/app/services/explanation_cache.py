@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.db.models import CachedExplanation
+from app.db.session import get_engine
+
+# key -> task generating that explanation, shared by concurrent requests
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def make_key(question_id: str, question_text: str, options: list[str] = [], correct_answer: Optional[str] = None) -> str:
+    payload = json.dumps([question_text, options, correct_answer], ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{question_id}:{digest}"
+
+
+def get_cached(key: str) -> Optional[str]:
+    with Session(get_engine()) as session:
+        row = session.get(CachedExplanation, key)
+        return row.explanation if row else None
+
+
+def get_cached_many(keys: List[str]) -> Dict[str, str]:
+    """
+    key -> explanation for every key that is stored, in one query.
+    """
+    if not keys:
+        return {}
+    with Session(get_engine()) as session:
+        rows = session.exec(select(CachedExplanation).where(CachedExplanation.key.in_(keys))).all()
+        return {row.key: row.explanation for row in rows}
+
+
+def store(key: str, question_id: str, explanation: str):
+    with Session(get_engine()) as session:
+        session.add(CachedExplanation(key=key, question_id=question_id, explanation=explanation))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another worker stored it first
+            session.rollback()
+
+
+# The cache is best-effort: with the database unreachable, explanations are still generated, just not stored
+
+async def lookup(key: str) -> Optional[str]:
+    try:
+        return await asyncio.to_thread(get_cached, key)
+    except Exception as e:
+        print(f"Explanation cache lookup failed: {e}")
+        return None
+
+
+async def lookup_many(keys: List[str]) -> Dict[str, str]:
+    try:
+        return await asyncio.to_thread(get_cached_many, keys)
+    except Exception as e:
+        print(f"Explanation cache lookup failed: {e}")
+        return {}
+
+
+async def save(key: str, question_id: str, explanation: str):
+    # generate_explanation reports failures as text; those must not be cached
+    if explanation and not explanation.startswith("Error"):
+        try:
+            await asyncio.to_thread(store, key, question_id, explanation)
+        except Exception as e:
+            print(f"Explanation cache save failed: {e}")
+
+
+async def _generate_and_store(key: str, question_id: str, generate: Callable[[], Awaitable[str]]) -> str:
+    explanation = await generate()
+    await save(key, question_id, explanation)
+    return explanation
+
+
+def pending(key: str) -> Optional[asyncio.Task]:
+    """
+    The in-flight generation task for key, if any.
+    """
+    return _inflight.get(key)
+
+
+async def get_or_generate(key: str, question_id: str, generate: Callable[[], Awaitable[str]]) -> str:
+    """
+    Returns the stored explanation for key, or runs generate() to create it.
+    Concurrent callers for the same key share a single generate() call.
+    """
+    cached = await lookup(key)
+    if cached is not None:
+        return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_generate_and_store(key, question_id, generate))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one client disconnecting must not cancel the call the others are waiting on
+    return await asyncio.shield(task)
+
+
+async def _generate_pack_and_store(
+    keys: List[str], question_ids: Dict[str, str], generate: Callable[[List[str]], Awaitable[List[str]]]
+) -> Dict[str, str]:
+    explanations = dict(zip(keys, await generate(keys)))
+    await asyncio.gather(*(save(key, question_ids[key], explanation) for key, explanation in explanations.items()))
+    return explanations
+
+
+async def _pick(pack_task: asyncio.Task, key: str) -> str:
+    return (await pack_task)[key]
+
+
+async def get_or_generate_many(
+    question_ids: Dict[str, str],
+    generate: Callable[[List[str]], Awaitable[List[str]]],
+    pack: Callable[[List[str]], List[List[str]]],
+) -> Dict[str, Tuple[str, bool]]:
+    """
+    Batch form of get_or_generate for question_ids (key -> question ID).
+    Stored explanations are read in one query and in-flight ones are awaited; the
+    remaining keys are split by pack() and each pack goes to one generate(keys)
+    call, which returns the explanations in the same order. Every generated key is
+    registered as in flight, so single requests arriving meanwhile share the pack's call.
+    Returns key -> (explanation, whether it came from the cache).
+    """
+    cached = await lookup_many(list(question_ids))
+    results = {key: (explanation, True) for key, explanation in cached.items()}
+
+    waiting = {}
+    todo = []
+    for key in question_ids:
+        if key in results:
+            continue
+        if key in _inflight:
+            waiting[key] = _inflight[key]
+        else:
+            todo.append(key)
+
+    for keys in pack(todo):
+        pack_task = asyncio.ensure_future(_generate_pack_and_store(keys, question_ids, generate))
+        for key in keys:
+            task = asyncio.ensure_future(_pick(pack_task, key))
+            _inflight[key] = task
+            task.add_done_callback(lambda _, key=key: _inflight.pop(key, None))
+            waiting[key] = task
+
+    # shield: as in get_or_generate, a disconnecting client must not cancel shared work
+    explanations = await asyncio.gather(*(asyncio.shield(task) for task in waiting.values()))
+    results.update((key, (explanation, False)) for key, explanation in zip(waiting, explanations))
+    return results
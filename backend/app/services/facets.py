@@ -0,0 +1,126 @@
+import threading
+import numpy as np
+from whoosh.idsets import BitSet
+from app.services.rebuilder import CoalescingRebuild
+
+FACET_FIELDS = ("subject", "year")
+# Generations kept built, so searchers lent just before a commit still find theirs
+KEEP_GENERATIONS = 2
+
+
+class _FacetData:
+    """
+    One generation's facet structures: per-value BitSets for filtering, and for
+    counting a docnum -> value code array per field (-1 where a document has no value).
+    """
+
+    def __init__(self, bitsets: dict, codes: dict, labels: dict):
+        self.bitsets = bitsets  # field -> value -> BitSet of docnums
+        self.codes = codes      # field -> int32 array indexed by docnum
+        self.labels = labels    # field -> list of values, indexed by code
+        self.code_of = {field: {value: i for i, value in enumerate(values)} for field, values in labels.items()}
+
+
+class FacetIndex:
+    """
+    Precomputed per-value document bitsets for the facet fields, built once
+    per index generation. Filters are applied by handing the intersected
+    bitset to Whoosh as the search filter, and facet counts come from one
+    vectorised pass over the matching docnums instead of extra queries.
+    A new generation is built in the background as soon as the index manager
+    picks it up, one build at a time; a request only builds (or waits for the
+    build) if it gets there first.
+    """
+
+    def __init__(self, index_manager, fields=FACET_FIELDS):
+        self.index_manager = index_manager
+        self.fields = fields
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built = {}  # generation -> _FacetData, oldest first
+        self._rebuilder = CoalescingRebuild(self._prebuild, "facet-rebuild")
+        index_manager.add_refresh_listener(self._on_refresh)
+
+    def _on_refresh(self, generation):
+        if generation not in self._built:
+            self.start_rebuild()
+
+    def start_rebuild(self):
+        self._rebuilder.request()
+
+    def _prebuild(self):
+        with self.index_manager.searcher() as searcher:
+            if searcher is not None:
+                self._for_searcher(searcher)
+
+    def _build(self, searcher) -> _FacetData:
+        reader = searcher.reader()
+        size = reader.doc_count_all()
+        bitsets, codes, labels = {}, {}, {}
+        for field in self.fields:
+            by_value = {}
+            values = []
+            field_codes = np.full(size, -1, dtype=np.int32)
+            if field in reader.schema:
+                for value in reader.field_terms(field):
+                    docnums = np.fromiter(reader.postings(field, value).all_ids(), dtype=np.int64)
+                    if not len(docnums):
+                        continue
+                    by_value[value] = BitSet(docnums.tolist(), size=size)
+                    field_codes[docnums] = len(values)
+                    values.append(value)
+            bitsets[field] = by_value
+            codes[field] = field_codes
+            labels[field] = values
+        return _FacetData(bitsets, codes, labels)
+
+    def _for_searcher(self, searcher) -> _FacetData:
+        generation = searcher.reader().generation()
+        data = self._built.get(generation)
+        if data is not None:
+            return data
+        with self._build_lock:
+            # Another thread may have built it while this one waited
+            data = self._built.get(generation)
+            if data is None:
+                data = self._build(searcher)
+                with self._lock:
+                    self._built[generation] = data
+                    while len(self._built) > KEEP_GENERATIONS:
+                        del self._built[min(self._built)]
+        return data
+
+    def filter_for(self, searcher, filters: dict):
+        """
+        Returns the docnum bitset allowed by filters ({field: value}), or None if no filter is active.
+        """
+        bitsets = self._for_searcher(searcher).bitsets
+        allowed = None
+        for field, value in filters.items():
+            bits = bitsets[field].get(value) or BitSet()
+            allowed = bits if allowed is None else allowed.intersection(bits)
+        return allowed
+
+    def counts(self, searcher, query, filters: dict) -> dict:
+        """
+        Facet value counts over the documents matching query.
+        Each facet is counted with every other active filter applied but not its own,
+        so selecting "Physics" still shows how many hits the other subjects have.
+        """
+        data = self._for_searcher(searcher)
+        matched = np.fromiter(searcher.docs_for_query(query), dtype=np.int64)
+        values = {field: data.codes[field][matched] for field in self.fields}
+        # Per matching document: does it pass each active filter?
+        passes = {f: values[f] == data.code_of[f].get(v, -2) for f, v in filters.items()}
+
+        counts = {}
+        for field in self.fields:
+            mask = None
+            for f, ok in passes.items():
+                if f != field:
+                    mask = ok if mask is None else mask & ok
+            codes = values[field] if mask is None else values[field][mask]
+            totals = np.bincount(codes[codes >= 0], minlength=len(data.labels[field]))
+            order = np.argsort(-totals, kind="stable")
+            counts[field] = {data.labels[field][i]: int(totals[i]) for i in order if totals[i]}
+        return counts
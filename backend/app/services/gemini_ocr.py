@@ -1,31 +1,35 @@
 
-from google import genai
 import os
 import json
-import time
-import random
+import hashlib
+import threading
+from typing import Optional
 from PIL import Image
 from dotenv import load_dotenv
+from app.services.rate_limiter import is_rate_limit, with_retries
+from app.services import ocr_cache, metrics
 
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Initialize client
-client = None
-if API_KEY:
-    client = genai.Client(api_key=API_KEY)
+_client = None
+_client_lock = threading.Lock()
 
-MODEL_NAME = "gemini-2.0-flash-exp" 
-
-def transcribe_image(image: Image.Image) -> dict:
+def get_client():
     """
-    Uses Gemini to extract text, options, and metadata from a question image.
+    Creates the Gemini client on first use (None without an API key); importing google.genai is slow.
     """
-    if not client:
-        raise ValueError("GEMINI_API_KEY not found in environment variables.")
+    global _client
+    with _client_lock:
+        if _client is None and API_KEY:
+            from google import genai
+            _client = genai.Client(api_key=API_KEY)
+        return _client
 
-    prompt = """
+MODEL_NAME = "gemini-2.0-flash-exp" 
+
+OCR_PROMPT = """
     Analyze this image of a multiple-choice question from a NEET/JEE exam.
     Extract the following fields and return ONLY a valid JSON object:
     {
@@ -36,37 +40,56 @@ def transcribe_image(image: Image.Image) -> dict:
     }
     If the image is not a question or unreadable, return {"error": "unreadable"}.
     """
-    
-    max_retries = 3
-    base_delay = 2
 
-    for attempt in range(max_retries):
-        try:
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=[prompt, image]
-            )
-            # Clean response to get just JSON
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text[7:-3].strip()
-            elif text.startswith("```"):
-                text = text[3:-3].strip()
-                
-            return json.loads(text)
-        except Exception as e:
-            error_str = str(e)
-            is_rate_limit = "429" in error_str
-            
-            if attempt == max_retries - 1 or not is_rate_limit:
-                 print(f"Error transforming image: {e}")
-                 # 'response' might not exist if assignment failed
-                 return {"error": str(e), "raw": ""}
-            
-            sleep_time = (base_delay * (3 ** attempt)) + random.uniform(5, 10)
-            print(f"Gemini OCR rate limit hit (Attempt {attempt+1}/{max_retries}). Retrying in {sleep_time:.2f}s...")
-            time.sleep(sleep_time)
-            
-    return {"error": "Failed after retries"}
+# Cached OCR results are only reused for the same model and prompt text
+PROMPT_VERSION = hashlib.sha256(OCR_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+async def cached_transcription(image: Image.Image) -> Optional[dict]:
+    """
+    The stored OCR result for this image under the current model/prompt, if any.
+    """
+    return await ocr_cache.lookup(ocr_cache.make_key(ocr_cache.image_hash(image), MODEL_NAME, PROMPT_VERSION))
+
+async def transcribe_image(image: Image.Image, max_retries: int = 3, image_path: Optional[str] = None) -> dict:
+    """
+    Uses Gemini to extract text, options, and metadata from a question image.
+    Results are cached by image hash plus model/prompt version, and a cached image
+    never reaches Gemini (or needs an API key). image_path is recorded with the
+    result so the index can be rebuilt from the cache alone.
+    Failures come back as {"error": ...}; "rate_limited" is set when the last attempt hit a 429,
+    so callers that manage their own backoff can pass max_retries=1.
+    """
+    digest = ocr_cache.image_hash(image)
+    key = ocr_cache.make_key(digest, MODEL_NAME, PROMPT_VERSION)
+    cached = await ocr_cache.lookup(key)
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if not client:
+        raise ValueError("GEMINI_API_KEY not found in environment variables.")
+
+    async def call():
+        response = await client.aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=[OCR_PROMPT, image]
+        )
+        metrics.record_usage("ocr", response)
+        # Clean response to get just JSON
+        text = response.text.strip()
+        if text.startswith("```json"):
+            text = text[7:-3].strip()
+        elif text.startswith("```"):
+            text = text[3:-3].strip()
+        return json.loads(text)
+
+    try:
+        # OCR keeps its longer backoff: 2s * 3^attempt plus 5-10s of jitter
+        result = await with_retries("ocr", call, max_retries=max_retries, backoff=3, jitter=(5, 10))
+    except Exception as e:
+        print(f"Error transforming image: {e}")
+        return {"error": str(e), "raw": "", "rate_limited": is_rate_limit(e)}
+    await ocr_cache.save(key, digest, MODEL_NAME, PROMPT_VERSION, result, image_path=image_path)
+    return result
 
 
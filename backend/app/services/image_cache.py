@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Where dataset files come from: the Hugging Face resolve URL, or a local mirror
+# directory laid out the same way (data/metadata.jsonl, images/...)
+DATASET_SOURCE = os.getenv("DATASET_SOURCE", "https://huggingface.co/datasets/Reja1/jee-neet-benchmark/resolve/main")
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+# Connections kept alive per host; should cover the number of download workers
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES = 5
+HTTP_TIMEOUT = 60
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Shared keep-alive session that retries connection errors, 429s and 5xx responses
+    with exponential backoff (honouring Retry-After).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=1,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD"),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _is_remote(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache for dataset files.
+    Blobs live under objects/<sha256[:2]>/<sha256>; refs/ maps each image_path to the
+    blob and the ETag it was served with. Identical images are stored once, and a
+    cached path is served from disk without touching the network unless revalidate
+    is requested (a conditional GET on the stored ETag).
+    """
+
+    def __init__(self, source: str = DATASET_SOURCE, cache_dir: str = IMAGE_CACHE_DIR, offline: bool = False):
+        self.source = source.rstrip("/")
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+
+    def _ref_path(self, image_path: str) -> str:
+        key = hashlib.sha1(image_path.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "refs", key[:2], key + ".json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def _read_ref(self, image_path: str) -> Optional[dict]:
+        try:
+            with open(self._ref_path(image_path), "r", encoding="utf-8") as f:
+                ref = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return ref if os.path.exists(self._blob_path(ref["sha256"])) else None
+
+    def _store(self, image_path: str, data: bytes, etag: Optional[str]) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob_path(digest)
+        if not os.path.exists(blob):
+            _write_atomic(blob, data)
+        ref = {"image_path": image_path, "sha256": digest, "etag": etag}
+        _write_atomic(self._ref_path(image_path), json.dumps(ref).encode("utf-8"))
+        return digest
+
+    def _read_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as f:
+            return f.read()
+
+    def fetch(self, image_path: str, revalidate: bool = False) -> bytes:
+        """
+        Bytes of a dataset file, from the cache when possible.
+        Raises FileNotFoundError if it is not cached in offline mode or missing from a
+        local mirror, and requests.HTTPError for a failed download.
+        """
+        image_path = image_path.lstrip("/")
+        ref = self._read_ref(image_path)
+        if ref and (self.offline or not revalidate):
+            self.hits += 1
+            return self._read_blob(ref["sha256"])
+        if self.offline:
+            raise FileNotFoundError(f"{image_path} is not in the image cache (offline mode)")
+
+        if not _is_remote(self.source):
+            local = os.path.join(self.source, image_path)
+            with open(local, "rb") as f:
+                data = f.read()
+            stat = os.stat(local)
+            etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+            if ref and ref.get("etag") == etag:
+                self.hits += 1
+                return self._read_blob(ref["sha256"])
+            self.misses += 1
+            self._store(image_path, data, etag)
+            return data
+
+        headers = {}
+        if ref and ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        resp = get_http_session().get(f"{self.source}/{image_path}", headers=headers, timeout=HTTP_TIMEOUT)
+        if resp.status_code == 304 and ref:
+            self.hits += 1
+            return self._read_blob(ref["sha256"])
+        resp.raise_for_status()
+        self.misses += 1
+        self._store(image_path, resp.content, resp.headers.get("ETag"))
+        return resp.content
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,192 @@
+import os
+import uuid
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import update
+from sqlmodel import Session, select
+from app.db.models import IngestJob
+from app.db.session import get_engine
+from itertools import islice
+from app.services.pdf_parser import iter_page_texts, iter_questions, tag_questions
+from app.services.search_engine import add_documents, indexed_ids
+from app.services.question_store import upsert_questions
+from app.services import metrics
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Questions handed to the indexer at a time; bounds memory regardless of paper size
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+# Idle workers re-check the queue this often (seconds), e.g. for jobs enqueued by another process
+POLL_INTERVAL = 5.0
+# A running job whose progress has not moved for this long is assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_workers: list[threading.Thread] = []
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def enqueue(filename: str, path: str, job_id: Optional[str] = None) -> IngestJob:
+    """
+    job_id: from new_job_id(), when the caller needs it before queueing (e.g. to name the upload).
+    """
+    job = IngestJob(id=job_id or new_job_id(), filename=filename, path=path)
+    with Session(get_engine()) as session:
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+    _wakeup.set()
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    with Session(get_engine()) as session:
+        return session.get(IngestJob, job_id)
+
+
+def _update(job_id: str, **fields):
+    fields["updated_at"] = datetime.utcnow()
+    with Session(get_engine()) as session:
+        session.execute(update(IngestJob).where(IngestJob.id == job_id).values(**fields))
+        session.commit()
+
+
+def _claim_next() -> Optional[IngestJob]:
+    """
+    Atomically moves the oldest queued job to running and returns it.
+    """
+    with Session(get_engine()) as session:
+        while True:
+            job = session.exec(
+                select(IngestJob).where(IngestJob.status == "queued").order_by(IngestJob.created_at).limit(1)
+            ).first()
+            if job is None:
+                return None
+            claimed = session.execute(
+                update(IngestJob)
+                .where(IngestJob.id == job.id, IngestJob.status == "queued")
+                .values(status="running", updated_at=datetime.utcnow())
+            )
+            session.commit()
+            if claimed.rowcount == 1:
+                session.refresh(job)
+                return job
+            # Another worker got it first; try the next one
+
+
+def requeue_stale_jobs():
+    """
+    Puts jobs left running by a crashed or restarted worker back on the queue.
+    """
+    cutoff = datetime.utcnow() - STALE_AFTER
+    with Session(get_engine()) as session:
+        result = session.execute(
+            update(IngestJob)
+            .where(IngestJob.status == "running", IngestJob.updated_at < cutoff)
+            .values(status="queued", pages_done=0, updated_at=datetime.utcnow())
+        )
+        session.commit()
+        if result.rowcount:
+            print(f"Requeued {result.rowcount} stale ingest job(s)")
+
+
+def _build_documents(filename: str, questions) -> list:
+    documents = []
+    for q in questions:
+        documents.append({
+            "id": f"{filename}_{q.id}",
+            "content": q.text,
+            "tags": ",".join(q.tags),
+            "year": "2023", # Placeholder, would come from metadata
+            "subject": q.subject,
+            "source": filename
+        })
+    return documents
+
+
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def process_job(job: IngestJob):
+    """
+    Streams the uploaded PDF page by page, indexing questions in bounded batches
+    as they are parsed and recording progress on the job.
+    """
+    import PyPDF2
+
+    try:
+        with open(job.path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            _update(job.id, pages_total=len(reader.pages))
+
+            def on_page(pages_done):
+                _update(job.id, pages_done=pages_done)
+
+            # Re-uploads of a paper only index the questions that are new
+            seen = indexed_ids(prefix=f"{job.filename}_")
+            pages = metrics.timed_iter(iter_page_texts(reader, on_page=on_page),
+                                       metrics.ingest_stage_seconds, stage="pdf_extraction")
+            questions = iter_questions(pages)
+            found = indexed = 0
+            for batch in _batched(questions, INGEST_BATCH_SIZE):
+                found += len(batch)
+                batch = [q for q in batch if f"{job.filename}_{q.id}" not in seen]
+                if not batch:
+                    _update(job.id, questions_found=found)
+                    continue
+                with metrics.ingest_stage_seconds.time(stage="tagging"):
+                    tag_questions(batch)
+                documents = _build_documents(job.filename, batch)
+                with metrics.ingest_stage_seconds.time(stage="db_upsert"):
+                    upsert_questions(documents)
+                add_documents(documents)
+                indexed += len(documents)
+                _update(job.id, questions_found=found, questions_indexed=indexed)
+
+        _update(job.id, status="done")
+
+    except Exception as e:
+        print(f"Ingest job {job.id} failed: {e}")
+        _update(job.id, status="failed", errors=list(job.errors or []) + [str(e)])
+
+
+def _worker_loop():
+    while not _stop.is_set():
+        try:
+            job = _claim_next()
+            if job is None:
+                requeue_stale_jobs()
+        except Exception as e:
+            print(f"Ingest worker could not read the job queue: {e}")
+            job = None
+
+        if job is None:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+        process_job(job)
+
+
+def start_workers(count: int = INGEST_WORKERS):
+    if _workers:
+        return
+    _stop.clear()
+    for i in range(count):
+        worker = threading.Thread(target=_worker_loop, name=f"ingest-worker-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+
+
+def stop_workers():
+    _stop.set()
+    _wakeup.set()
+    for worker in _workers:
+        worker.join(timeout=5)
+    _workers.clear()
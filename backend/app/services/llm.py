@@ -1,27 +1,51 @@
-from google import genai
 from app.core.config import settings
-from typing import Optional
-import time
-import random
+from app.services.rate_limiter import is_rate_limit, with_retries
+from app.services import metrics
+from typing import AsyncIterator, Optional
+import os
+import json
+import asyncio
+import threading
 
-# Initialize client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+_client = None
+_client_lock = threading.Lock()
 
-def generate_explanation(question_text: str, options: list[str] = [], correct_answer: Optional[str] = None) -> str:
+def get_client():
     """
-    Generates an explanation for a given question using Google Gemini.
-    Includes retry logic for rate limits.
-    """
-    model_name = "gemini-2.0-flash-lite-preview-02-05" 
-    # Use reliable internal model ID if 2.5 is problematic, but the user wants 2.5-flash-lite
-    # Previous logs showed 2.5-flash-lite working until quota hit.
-    # However, to ensure success now, I will use "gemini-2.0-flash-lite-preview-02-05" which is the current "Flash Lite" reference or just "gemini-2.0-flash-lite".
-    # Let's revert to "gemini-2.0-flash" or try "gemini-2.0-flash-lite-preview" if we want to be cutting edge.
-    # SAFEST: "gemini-1.5-flash" - known good for production? No, user wanted 2.5.
-    # The quota error earlier showed: `value: "gemini-2.5-flash-lite"`. So the ID is valid.
-    model_name = "gemini-2.5-flash-lite"
-
-    prompt = f"""
+    Creates the Gemini client on first use; importing google.genai is slow.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not settings.GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY not found in environment variables.")
+            from google import genai
+            _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        return _client
+
+# The quota error earlier showed: `value: "gemini-2.5-flash-lite"`. So the ID is valid.
+MODEL_NAME = "gemini-2.5-flash-lite"
+
+# Questions packed into one /explain/batch prompt, and a cap on their combined text so
+# long questions get smaller packs and the answers stay well inside the output limit
+EXPLAIN_BATCH_SIZE = int(os.getenv("EXPLAIN_BATCH_SIZE", "5"))
+EXPLAIN_BATCH_MAX_CHARS = int(os.getenv("EXPLAIN_BATCH_MAX_CHARS", "6000"))
+
+# Structured output for batch prompts: one {"id", "explanation"} object per question
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "explanation": {"type": "STRING"},
+        },
+        "required": ["id", "explanation"],
+    },
+}
+
+def build_prompt(question_text: str, options: list[str] = [], correct_answer: Optional[str] = None) -> str:
+    return f"""
     Explain the following NEET/JEE question clearly.
     
     Question: {question_text}
@@ -36,29 +60,159 @@ def generate_explanation(question_text: str, options: list[str] = [], correct_an
     2. Briefly explain why the other options are incorrect.
     3. State the key concept from NCERT (Physics/Chemistry/Biology) involved.
     """
-    
-    max_retries = 3
-    base_delay = 2  # seconds
-
-    for attempt in range(max_retries):
-        try:
-            # New SDK usage
-            response = client.models.generate_content(
-                model=model_name,
-                contents=prompt
-            )
-            return response.text
-        except Exception as e:
-            error_str = str(e)
-            is_rate_limit = "429" in error_str
-            
-            # If it's the last attempt, or not a rate limit error that we want to retry immediately
-            if attempt == max_retries - 1 or not is_rate_limit:
-                return f"Error generating explanation: {error_str}"
-            
-            # Calculate sleep time with exponential backoff and jitter
-            sleep_time = (base_delay * (2 ** attempt)) + random.uniform(0, 1)
-            print(f"Gemini API rate limit hit (Attempt {attempt+1}/{max_retries}). Retrying in {sleep_time:.2f}s...")
-            time.sleep(sleep_time)
-
-    return "Error: Failed to generate explanation after retries."
+
+def _question_chars(question: dict) -> int:
+    return len(question["question_text"]) + sum(len(opt) for opt in question.get("options") or [])
+
+def pack_questions(questions: list[dict], size: int = EXPLAIN_BATCH_SIZE, max_chars: int = EXPLAIN_BATCH_MAX_CHARS) -> list[list[int]]:
+    """
+    Splits questions into packs of at most size questions and about max_chars of
+    question text each, returned as lists of indexes into questions.
+    A question longer than max_chars gets a pack of its own.
+    """
+    packs, pack, chars = [], [], 0
+    for i, question in enumerate(questions):
+        length = _question_chars(question)
+        if pack and (len(pack) >= size or chars + length > max_chars):
+            packs.append(pack)
+            pack, chars = [], 0
+        pack.append(i)
+        chars += length
+    if pack:
+        packs.append(pack)
+    return packs
+
+def build_batch_prompt(questions: list[dict]) -> str:
+    """
+    One prompt explaining every question, labelled Q1, Q2, ... so the JSON answers can be matched back.
+    """
+    blocks = []
+    for n, question in enumerate(questions, 1):
+        options = question.get("options") or []
+        correct_answer = question.get("correct_answer")
+        blocks.append(f"""
+    [Q{n}]
+    Question: {question["question_text"]}
+
+    Options:
+    {chr(10).join(f"- {opt}" for opt in options)}
+
+    Correct Answer from Key: {correct_answer if correct_answer else "Not provided (deduce it)"}
+    """)
+    return f"""
+    Explain each of the following {len(questions)} NEET/JEE questions clearly.
+    {"".join(blocks)}
+    Task, for every question separately:
+    1. Identify the correct option and explain WHY it is correct.
+    2. Briefly explain why the other options are incorrect.
+    3. State the key concept from NCERT (Physics/Chemistry/Biology) involved.
+
+    Answer with a JSON array holding one object per question, in order:
+    {{"id": "<Q label>", "explanation": "<the explanation, markdown allowed>"}}
+    """
+
+def parse_batch_response(text: str, count: int) -> dict[int, str]:
+    """
+    Maps question index -> explanation from a batch response. Questions the model
+    skipped, or answered with an unknown label, are left out.
+    """
+    try:
+        items = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    if isinstance(items, dict):
+        # Tolerate {"explanations": [...]} in case the schema was not honoured
+        items = next((v for v in items.values() if isinstance(v, list)), [])
+    explanations = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        label = str(item.get("id", "")).strip().lstrip("[").rstrip("]").upper()
+        explanation = item.get("explanation")
+        if label.startswith("Q") and label[1:].isdigit() and isinstance(explanation, str) and explanation.strip():
+            index = int(label[1:]) - 1
+            if 0 <= index < count:
+                explanations.setdefault(index, explanation)
+    return explanations
+
+async def generate_explanation(question_text: str, options: list[str] = [], correct_answer: Optional[str] = None) -> str:
+    """
+    Generates an explanation for a given question using Google Gemini.
+    Rate-limited calls are retried (see with_retries); failures come back as "Error..." text.
+    """
+    prompt = build_prompt(question_text, options, correct_answer)
+
+    async def call():
+        response = await get_client().aio.models.generate_content(model=MODEL_NAME, contents=prompt)
+        metrics.record_usage("explain", response)
+        return response.text
+
+    try:
+        return await with_retries("explain", call)
+    except Exception as e:
+        return f"Error generating explanation: {e}"
+
+async def stream_explanation(question_text: str, options: list[str] = [], correct_answer: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Streams the explanation text chunk by chunk as Gemini produces it.
+    Rate-limited attempts are retried only until the first chunk arrives;
+    after that, or once retries run out, the error is raised to the caller.
+    """
+    prompt = build_prompt(question_text, options, correct_answer)
+
+    async def open_stream():
+        stream = await get_client().aio.models.generate_content_stream(model=MODEL_NAME, contents=prompt)
+        chunks = stream.__aiter__()
+        return chunks, await anext(chunks, None)
+
+    # The request is timed to its first chunk, not to the end of the answer
+    chunks, chunk = await with_retries("explain_stream", open_stream)
+    last = chunk
+    try:
+        while chunk is not None:
+            if chunk.text:
+                yield chunk.text
+            last = chunk
+            chunk = await anext(chunks, None)
+    except Exception as e:
+        metrics.record_failure("explain_stream", is_rate_limit(e))
+        raise
+    # Usage is reported on the final chunk
+    metrics.record_usage("explain_stream", last)
+
+async def generate_batch_explanations(questions: list[dict]) -> list[str]:
+    """
+    Explains several questions (dicts with question_text, options, correct_answer)
+    with a single Gemini call, returning one explanation per question in order.
+    Questions missing from the JSON answer are retried one at a time with
+    generate_explanation. Like generate_explanation, failures come back as "Error..." text.
+    """
+    if len(questions) == 1:
+        question = questions[0]
+        return [await generate_explanation(question["question_text"], question.get("options") or [], question.get("correct_answer"))]
+
+    prompt = build_batch_prompt(questions)
+
+    async def call():
+        response = await get_client().aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=prompt,
+            config={"response_mime_type": "application/json", "response_schema": BATCH_RESPONSE_SCHEMA},
+        )
+        metrics.record_usage("explain_batch", response)
+        return parse_batch_response(response.text, len(questions))
+
+    try:
+        explanations = await with_retries("explain_batch", call)
+    except Exception as e:
+        return [f"Error generating explanation: {e}"] * len(questions)
+
+    missing = [i for i in range(len(questions)) if i not in explanations]
+    if missing:
+        print(f"Batch explanation answered {len(explanations)}/{len(questions)} questions; explaining the rest one by one")
+        retried = await asyncio.gather(*(
+            generate_explanation(questions[i]["question_text"], questions[i].get("options") or [], questions[i].get("correct_answer"))
+            for i in missing
+        ))
+        explanations.update(zip(missing, retried))
+    return [explanations[i] for i in range(len(questions))]
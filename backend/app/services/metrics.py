@@ -0,0 +1,259 @@
+import math
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Sequence, Tuple
+
+# Latency buckets (seconds) from sub-millisecond search stages to slow Gemini calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        """
+        Sum over every label combination.
+        """
+        with self._lock:
+            return sum(self._values.values())
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in values]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram, as Prometheus expects: one bisect and three
+    additions per observation.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels) -> _Timer:
+        """
+        Context manager observing the seconds spent in its block.
+        """
+        return _Timer(self, labels)
+
+    def collect(self):
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class FunctionMetric(_Metric):
+    """
+    A gauge (or counter kept elsewhere) read at scrape time: func() returns a number,
+    or {label values tuple: number}. A failed read leaves the metric out rather than
+    failing the scrape.
+    """
+
+    def __init__(self, name: str, documentation: str, func: Callable, labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+        self.kind = kind
+
+    def collect(self):
+        try:
+            values = self.func()
+        except Exception as e:
+            print(f"Metric {self.name} could not be read: {e}")
+            return []
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.header()
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Search: one observation per stage per query that misses the result cache
+search_stage_seconds = Histogram(
+    "pyq_search_stage_seconds",
+    "Time per search stage: spell_correction, parse, search, vector, hits, facets, serialize.",
+    ["stage"],
+)
+search_queries_total = Counter("pyq_search_queries_total", "Searches run against the index, by mode.", ["mode"])
+# Typo handling: the spell corrector rewrites misspelled terms before the search (the old fuzzy fallback)
+search_fuzzy_fallback_total = Counter(
+    "pyq_search_fuzzy_fallback_total", "Searches whose query was rewritten by spelling correction."
+)
+search_errors_total = Counter("pyq_search_errors_total", "Searches that raised an error.")
+
+# Ingest
+ingest_stage_seconds = Histogram(
+    "pyq_ingest_stage_seconds",
+    "Time per ingest stage: upload_save (per file), pdf_extraction (per page), tagging and db_upsert "
+    "(per batch), index_commit (per commit).",
+    ["stage"],
+)
+ingest_documents_total = Counter("pyq_ingest_documents_total", "Documents written to the index.")
+
+# Gemini
+gemini_request_seconds = Histogram(
+    "pyq_gemini_request_seconds", "Latency of each Gemini API call, by operation.", ["operation"]
+)
+gemini_retries_total = Counter("pyq_gemini_retries_total", "Gemini calls retried after a failure.", ["operation"])
+gemini_rate_limited_total = Counter("pyq_gemini_rate_limited_total", "Gemini calls rejected with a 429.", ["operation"])
+gemini_errors_total = Counter("pyq_gemini_errors_total", "Gemini calls that failed, including 429s.", ["operation"])
+gemini_tokens_total = Counter(
+    "pyq_gemini_tokens_total", "Tokens reported by Gemini usage metadata, by operation and kind (prompt/output).",
+    ["operation", "kind"],
+)
+
+
+def _fallback_ratio():
+    queries = search_queries_total.total()
+    return search_fuzzy_fallback_total.value() / queries if queries else 0.0
+
+
+FunctionMetric("pyq_search_fuzzy_fallback_ratio", "Share of searches rewritten by spelling correction.", _fallback_ratio)
+
+
+def record_usage(operation: str, response):
+    """
+    Adds the prompt/output token counts from a Gemini response (or final stream chunk), if reported.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attribute in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        count = getattr(usage, attribute, None)
+        if count:
+            gemini_tokens_total.inc(count, operation=operation, kind=kind)
+
+
+def record_failure(operation: str, rate_limited: bool):
+    gemini_errors_total.inc(operation=operation)
+    if rate_limited:
+        gemini_rate_limited_total.inc(operation=operation)
+
+
+def timed_iter(iterable: Iterable, histogram: Histogram, **labels) -> Iterator:
+    """
+    Yields the items of iterable, observing how long each one took to produce.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        histogram.observe(time.perf_counter() - start, **labels)
+        yield item
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.db.models import CachedOcrResult
+from app.db.session import get_engine
+
+
+def image_hash(image) -> str:
+    """
+    Hash of the decoded pixels, so the same question image hashes the same whether
+    it came from a PNG download or the datasets library.
+    """
+    digest = hashlib.sha256(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def make_key(image_digest: str, model: str, prompt_version: str) -> str:
+    return f"{image_digest}:{model}:{prompt_version}"
+
+
+def get_cached(key: str) -> Optional[dict]:
+    with Session(get_engine()) as session:
+        row = session.get(CachedOcrResult, key)
+        return row.result if row else None
+
+
+def store(key: str, image_digest: str, model: str, prompt_version: str, result: dict, image_path: Optional[str] = None):
+    row = CachedOcrResult(key=key, image_hash=image_digest, image_path=image_path,
+                          model=model, prompt_version=prompt_version, result=result)
+    with Session(get_engine()) as session:
+        session.add(row)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another worker stored it first
+            session.rollback()
+
+
+# The cache is best-effort: with the database unreachable, images are still transcribed, just not stored
+
+async def lookup(key: str) -> Optional[dict]:
+    try:
+        return await asyncio.to_thread(get_cached, key)
+    except Exception as e:
+        print(f"OCR cache lookup failed: {e}")
+        return None
+
+
+async def save(key: str, image_digest: str, model: str, prompt_version: str, result: dict, image_path: Optional[str] = None):
+    # Failures (including the model answering "unreadable") are retried next run, not cached
+    if result and not result.get("error"):
+        try:
+            await asyncio.to_thread(store, key, image_digest, model, prompt_version, result, image_path)
+        except Exception as e:
+            print(f"OCR cache save failed: {e}")
+
+
+def results_by_image_path(model: str, prompt_version: str) -> dict:
+    """
+    image_path -> OCR result for every cached image of the given model/prompt version,
+    loaded in one query for rebuilding the index.
+    """
+    with Session(get_engine()) as session:
+        rows = session.exec(
+            select(CachedOcrResult.image_path, CachedOcrResult.result).where(
+                CachedOcrResult.model == model,
+                CachedOcrResult.prompt_version == prompt_version,
+                CachedOcrResult.image_path.is_not(None),
+            )
+        )
+        return {image_path: result for image_path, result in rows}
@@ -1,16 +1,45 @@
+import os
 import re
-import spacy
-from typing import List, Dict, Optional
+import threading
+from typing import Iterable, Iterator, List, Dict, Optional
 from pydantic import BaseModel
 
-# Load spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy model...")
-    from spacy.cli import download
-    download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+# nlp.pipe settings for tagging; n_process > 1 pays off for bulk ingestion only
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+TAG_LABELS = ("ORG", "PRODUCT", "WORK_OF_ART", "PERSON")
+
+def _ner_only(nlp):
+    """
+    Tagging only reads doc.ents, so every component except NER (and any
+    tok2vec it listens to) is switched off.
+    """
+    needed = {"ner"}
+    for name, proc in nlp.pipeline:
+        if "ner" in getattr(proc, "listening_components", []):
+            needed.add(name)
+    nlp.select_pipes(enable=[name for name in nlp.pipe_names if name in needed])
+    return nlp
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """
+    Loads the spaCy model on first use, so importing this module stays cheap.
+    """
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            import spacy
+            try:
+                _nlp = _ner_only(spacy.load("en_core_web_sm"))
+            except OSError:
+                print("Downloading spaCy model...")
+                from spacy.cli import download
+                download("en_core_web_sm")
+                _nlp = _ner_only(spacy.load("en_core_web_sm"))
+        return _nlp
 
 class ParsedQuestion(BaseModel):
     id: Optional[str] = None
@@ -19,13 +48,19 @@ class ParsedQuestion(BaseModel):
     subject: Optional[str] = None
     tags: List[str] = []
 
-def extract_text_from_pdf(reader) -> str:
-    text = ""
-    for page in reader.pages:
+def iter_page_texts(reader, on_page=None) -> Iterator[str]:
+    """
+    Yields the text of one page at a time (empty string for pages without text).
+    on_page: optional callback(pages_done) for progress reporting
+    """
+    for i, page in enumerate(reader.pages):
         page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
-    return text
+        yield page_text + "\n" if page_text else ""
+        if on_page:
+            on_page(i + 1)
+
+def extract_text_from_pdf(reader, on_page=None) -> str:
+    return "".join(iter_page_texts(reader, on_page=on_page))
 
 def clean_text(text: str) -> str:
     # Remove header/footer noise (simple heuristic)
@@ -33,54 +68,76 @@ def clean_text(text: str) -> str:
     cleaned_lines = [line for line in lines if len(line.strip()) > 3] # Remove very short lines
     return " ".join(cleaned_lines)
 
-def parse_questions_from_text(text: str) -> List[ParsedQuestion]:
+# Regex for Question Start: "1." or "1)" at start of line or after newline
+question_pattern = re.compile(r'(?:\n|^)(\d+)[\.\)]\s+')
+
+def _parse_question_block(q_block: str) -> Optional[ParsedQuestion]:
+    q_block = q_block.strip()
+
+    # separate question number
+    match = question_pattern.match(q_block) or question_pattern.search(q_block)
+    if not match:
+        return None
+    q_num = match.group(1)
+    content = q_block[match.end():].strip()
+
+    # Basic Option Extraction (A., B., C., D. or (a), (b)...)
+    # simplistic splitting for now
+    # In a real scenario, this needs robust regex for options
+    
+    # Subject heuristic (very naive, usually passed via file metadata)
+    subject = "General"
+    if "physics" in content.lower(): subject = "Physics"
+    elif "chemistry" in content.lower(): subject = "Chemistry"
+    elif "biology" in content.lower(): subject = "Biology"
+
+    return ParsedQuestion(
+        id=str(q_num),
+        text=content,
+        subject=subject
+    )
+
+def tag_questions(questions: List[ParsedQuestion], batch_size: int = SPACY_BATCH_SIZE, n_process: int = SPACY_N_PROCESS) -> List[ParsedQuestion]:
+    """
+    Fills in NLP tags for a batch of questions with a single nlp.pipe pass.
+    """
+    snippets = (q.text[:200] for q in questions) # Analyze first 200 chars for topics
+    docs = get_nlp().pipe(snippets, batch_size=batch_size, n_process=n_process)
+    for question, doc in zip(questions, docs):
+        question.tags = [ent.text for ent in doc.ents if ent.label_ in TAG_LABELS]
+    return questions
+
+def iter_questions(chunks: Iterable[str]) -> Iterator[ParsedQuestion]:
     """
-    Heuristic parser for standard exam papers.
+    Heuristic parser for standard exam papers, fed text incrementally (e.g. page by page).
+    Questions come out untagged; run batches of them through tag_questions.
     Assumes questions start with a number followed by dot or parenthesis (e.g., "1.", "1)").
+    A question is yielded as soon as the next one starts, so only the current,
+    possibly page-spanning, question is held in memory.
     """
-    # Regex for Question Start: "1." or "1)" at start of line or after newline
-    question_pattern = re.compile(r'(?:\n|^)(\d+)[\.\)]\s+')
-    
-    questions = []
-    splits = list(question_pattern.finditer(text))
-    
-    if not splits:
-        return []
-
-    for i in range(len(splits)):
-        start = splits[i].start()
-        end = splits[i+1].start() if i + 1 < len(splits) else len(text)
-        
-        # Extract full question block
-        q_block = text[start:end].strip()
-        
-        # separate question number
-        match = question_pattern.match(q_block) or question_pattern.search(q_block)
-        if match:
-            q_num = match.group(1)
-            content = q_block[match.end():].strip()
-        else:
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        splits = list(question_pattern.finditer(buffer))
+        if not splits:
+            # No question has started yet: drop the preamble, keeping the last
+            # line in case a question number is split across chunks
+            newline = buffer.rfind("\n")
+            if newline > 0:
+                buffer = buffer[newline:]
             continue
 
-        # Basic Option Extraction (A., B., C., D. or (a), (b)...)
-        # simplistic splitting for now
-        # In a real scenario, this needs robust regex for options
-        
-        # NLP Tagging
-        doc = nlp(content[:200]) # Analyze first 200 chars for topics
-        tags = [ent.text for ent in doc.ents if ent.label_ in ("ORG", "PRODUCT", "WORK_OF_ART", "PERSON")]
-        
-        # Subject heuristic (very naive, usually passed via file metadata)
-        subject = "General"
-        if "physics" in content.lower(): subject = "Physics"
-        elif "chemistry" in content.lower(): subject = "Chemistry"
-        elif "biology" in content.lower(): subject = "Biology"
-
-        questions.append(ParsedQuestion(
-            id=str(q_num),
-            text=content,
-            tags=tags,
-            subject=subject
-        ))
-        
-    return questions
+        for current, following in zip(splits, splits[1:]):
+            question = _parse_question_block(buffer[current.start():following.start()])
+            if question:
+                yield question
+        # The last question may continue in the next chunk
+        buffer = buffer[splits[-1].start():]
+
+    if question_pattern.search(buffer):
+        question = _parse_question_block(buffer)
+        if question:
+            yield question
+
+def parse_questions_from_text(text: str) -> List[ParsedQuestion]:
+    return tag_questions(list(iter_questions([text])))
@@ -0,0 +1,87 @@
+import time
+import threading
+from collections import OrderedDict
+from app.services.search_engine import index_manager
+from app.services import metrics
+
+# Sized for the few hundred topic queries that dominate traffic
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL = 300  # seconds
+
+
+def normalize_query(query_str: str) -> str:
+    """
+    Collapses whitespace, so "carnot  engine" and " carnot engine" share one cache entry.
+    Case is kept: subject and year are matched as exact, case-sensitive terms, so
+    "Physics" and "physics" can have different hits.
+    """
+    return " ".join(query_str.split())
+
+
+class QueryCache:
+    """
+    In-memory LRU/TTL cache of search result lists.
+    Keys include the index generation, and the whole cache is dropped when a
+    new generation is committed, so stale results are never served.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, query_str: str, **params):
+        return (index_manager.generation, normalize_query(query_str), tuple(sorted(params.items())))
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, *_):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+search_cache = QueryCache()
+index_manager.add_refresh_listener(search_cache.clear)
+
+metrics.FunctionMetric("pyq_search_cache_hits_total", "Searches answered from the result cache.",
+                       lambda: search_cache.hits, kind="counter")
+metrics.FunctionMetric("pyq_search_cache_misses_total", "Searches that missed the result cache.",
+                       lambda: search_cache.misses, kind="counter")
+metrics.FunctionMetric("pyq_search_cache_entries", "Result pages held in the cache.",
+                       lambda: len(search_cache._entries))
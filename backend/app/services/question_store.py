@@ -0,0 +1,114 @@
+import io
+import csv
+import json
+from datetime import datetime
+from typing import Iterator, Sequence
+from sqlalchemy import func, select
+from sqlmodel import Session
+from app.db.models import Question
+from app.db.session import get_engine
+
+# Rows per executemany round trip, and rows per fetch from the server-side cursor
+LOAD_BATCH_SIZE = 1000
+STREAM_BATCH_SIZE = 2000
+
+COLUMNS = [c.name for c in Question.__table__.columns]
+# Columns the search index stores; everything except the bookkeeping timestamps
+DOCUMENT_FIELDS = [c for c in COLUMNS if c not in ("created_at", "updated_at")]
+_JSON_COLUMNS = {"options", "correct_answer"}
+
+
+def _row(doc: dict, now: datetime) -> dict:
+    row = {field: doc.get(field) for field in DOCUMENT_FIELDS}
+    row["id"] = str(row["id"])
+    if row["year"] is not None:
+        row["year"] = str(row["year"])
+    row["created_at"] = row["updated_at"] = now
+    return row
+
+
+def _copy_upsert(engine, rows: list):
+    """
+    Postgres: COPY the rows into a temporary table, then upsert them in one statement.
+    """
+    table = Question.__table__.name
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in COLUMNS if c not in ("id", "created_at"))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            r"\N" if row[c] is None else json.dumps(row[c]) if c in _JSON_COLUMNS else row[c]
+            for c in COLUMNS
+        ])
+    buffer.seek(0)
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE question_load (LIKE {table}) ON COMMIT DROP")
+            cursor.copy_expert(f"COPY question_load ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(COLUMNS)}) SELECT {', '.join(COLUMNS)} FROM question_load "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}"
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _executemany_upsert(engine, rows: list):
+    """
+    Other databases (the SQLite fallback): batched multi-row upserts.
+    """
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    stmt = insert(Question.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={c: stmt.excluded[c] for c in COLUMNS if c not in ("id", "created_at")},
+    )
+    with engine.begin() as conn:
+        for start in range(0, len(rows), LOAD_BATCH_SIZE):
+            conn.execute(stmt, rows[start:start + LOAD_BATCH_SIZE])
+
+
+def upsert_questions(documents: Sequence[dict]) -> int:
+    """
+    Inserts or updates questions from index-style documents (the dicts passed to
+    add_documents). Postgres loads through COPY; other databases use executemany batches.
+    """
+    now = datetime.utcnow()
+    # Last copy of an id wins, as it would in the index
+    rows = list({str(doc["id"]): _row(doc, now) for doc in documents}.values())
+    if not rows:
+        return 0
+    engine = get_engine()
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+        _copy_upsert(engine, rows)
+    else:
+        _executemany_upsert(engine, rows)
+    return len(rows)
+
+
+def count_questions() -> int:
+    with Session(get_engine()) as session:
+        return session.execute(select(func.count()).select_from(Question)).scalar_one()
+
+
+def iter_documents(batch_size: int = STREAM_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Streams every question as an index document. On Postgres this uses a server-side
+    cursor, so memory stays flat however large the table is.
+    """
+    columns = [Question.__table__.c[f] for f in DOCUMENT_FIELDS]
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            select(*columns).order_by(Question.__table__.c.id)
+        )
+        for row in result:
+            yield {field: value for field, value in zip(DOCUMENT_FIELDS, row) if value is not None}
@@ -0,0 +1,147 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+from app.services import metrics
+
+load_dotenv()
+
+# Requests per minute allowed by our Gemini quota, and how many may go out back to back
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "3"))
+# Search-time query embeddings: a budget of their own, so a search never waits behind ingestion
+GEMINI_QUERY_RPM = float(os.getenv("GEMINI_QUERY_RPM", "60"))
+GEMINI_QUERY_BURST = int(os.getenv("GEMINI_QUERY_BURST", "5"))
+GEMINI_RETRIES = 3
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Async token-bucket limiter.
+    State is guarded by a thread lock rather than an asyncio.Lock so one bucket
+    can be shared by the API event loop and scripts that call asyncio.run repeatedly.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> float:
+        """
+        Takes a token and returns 0, or returns how long to wait before one is available.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, timeout: float = None) -> bool:
+        """
+        acquire() for synchronous callers on worker threads, e.g. embedding during indexing.
+        Returns False if no token became available within timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def drain(self):
+        """
+        Empties the bucket, e.g. after a 429, so every caller backs off together.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+# Shared by every Gemini call in the process (explanations, OCR and document embeddings)
+gemini_limiter = TokenBucket(GEMINI_RPM / 60.0, GEMINI_BURST)
+# Query embeddings only; the embedding model's quota is separate from the generation models'
+query_limiter = TokenBucket(GEMINI_QUERY_RPM / 60.0, GEMINI_QUERY_BURST)
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return "429" in str(error)
+
+
+def _retry_delay(operation: str, error: Exception, attempt: int, max_retries: int, limiter: TokenBucket,
+                 base_delay: float, backoff: float, jitter: Tuple[float, float]) -> Optional[float]:
+    """
+    Bookkeeping for a failed attempt; returns how long to sleep before retrying, or None to give up.
+    """
+    rate_limited = is_rate_limit(error)
+    metrics.record_failure(operation, rate_limited)
+    if rate_limited:
+        # Every caller backs off together, not just this one
+        limiter.drain()
+    if attempt == max_retries - 1 or not rate_limited:
+        return None
+    metrics.gemini_retries_total.inc(operation=operation)
+    delay = base_delay * (backoff ** attempt) + random.uniform(*jitter)
+    print(f"Gemini API rate limit hit ({operation}, attempt {attempt + 1}/{max_retries}). Retrying in {delay:.2f}s...")
+    return delay
+
+
+async def with_retries(operation: str, call: Callable[[], Awaitable[T]], max_retries: int = GEMINI_RETRIES,
+                       base_delay: float = 2, backoff: float = 2, jitter: Tuple[float, float] = (0, 1),
+                       limiter: TokenBucket = gemini_limiter) -> T:
+    """
+    Awaits call() (one Gemini request) once limiter has a token, timed under operation.
+    Rate-limited (429) attempts are retried with exponential backoff and jitter; any
+    other error, or the last attempt's, is raised for the caller to report.
+    """
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        try:
+            with metrics.gemini_request_seconds.time(operation=operation):
+                return await call()
+        except Exception as e:
+            delay = _retry_delay(operation, e, attempt, max_retries, limiter, base_delay, backoff, jitter)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+
+
+def with_retries_blocking(operation: str, call: Callable[[], T], max_retries: int = GEMINI_RETRIES,
+                          base_delay: float = 2, backoff: float = 2, jitter: Tuple[float, float] = (0, 1),
+                          limiter: TokenBucket = gemini_limiter, wait: Optional[float] = None) -> T:
+    """
+    with_retries() for synchronous callers on worker threads. Raises RuntimeError if
+    limiter has no token within wait seconds (None waits as long as it takes).
+    """
+    for attempt in range(max_retries):
+        if not limiter.acquire_blocking(timeout=wait):
+            raise RuntimeError(f"Gemini quota busy; {operation} not attempted")
+        try:
+            with metrics.gemini_request_seconds.time(operation=operation):
+                return call()
+        except Exception as e:
+            delay = _retry_delay(operation, e, attempt, max_retries, limiter, base_delay, backoff, jitter)
+            if delay is None:
+                raise
+        time.sleep(delay)
@@ -0,0 +1,38 @@
+import threading
+from typing import Callable
+
+
+class CoalescingRebuild:
+    """
+    Runs build() in a background thread on request, one build at a time.
+    A request that arrives while a build is running is not dropped: the thread
+    builds once more when it finishes, so the last build always starts after the
+    last request. Any number of requests during one build cost one extra build.
+    """
+
+    def __init__(self, build: Callable[[], None], name: str):
+        self.build = build
+        self.name = name
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+
+    def request(self):
+        with self._lock:
+            self._pending = True
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+            try:
+                self.build()
+            except Exception as e:
+                print(f"Background {self.name} failed: {e}")
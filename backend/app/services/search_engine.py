@@ -1,9 +1,47 @@
 import os
+import html
+import json
+import time
+import threading
+import shutil
+from collections import Counter, deque
+from itertools import islice
+from contextlib import contextmanager
 from whoosh.index import create_in, open_dir, exists_in
 from whoosh.fields import Schema, TEXT, ID, KEYWORD, STORED
 from whoosh.qparser import MultifieldParser, FuzzyTermPlugin
+from whoosh.highlight import highlight, get_text, ContextFragmenter, HtmlFormatter
+from app.services.spellcheck import SpellCorrector
+from app.services.facets import FacetIndex
+from app.services import dedup, metrics
+from app.services.dedup import DedupIndex, appearance
 
 INDEX_DIR = "indexdir"
+SEARCH_FIELDS = ["content", "tags", "subject", "year"]
+
+# Idle searchers kept per index generation
+SEARCHER_POOL_SIZE = 8
+# How often (seconds) to look for commits made by other processes, e.g. ingest scripts
+REFRESH_CHECK_INTERVAL = 1.0
+# BulkIndexWriter commits after this many buffered documents or this many seconds
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", "30"))
+# How long (seconds) a writer waits for another writer, e.g. a concurrent ingest job, to commit
+WRITE_LOCK_TIMEOUT = float(os.getenv("WRITE_LOCK_TIMEOUT", "120"))
+# Candidates taken from each ranking before reciprocal rank fusion, and the RRF damping constant
+HYBRID_DEPTH = 50
+RRF_K = 60
+# Append-only list of document ids whose commit has completed, one per line
+JOURNAL_NAME = "committed_ids.journal"
+# Documents committed while a rebuild runs, replayed into the rebuilt index before it is swapped in
+REPLAY_NAME = "replay.jsonl"
+# Fields a hit can carry; "snippet" is highlighted fragments of content around the matched terms
+RESULT_FIELDS = ("id", "score", "snippet", "content", "subject", "year", "tags", "options",
+                 "correct_answer", "explanation", "source", "appearances")
+# What a search hit carries unless fields= asks for more: enough to render a results list
+DEFAULT_RESULT_FIELDS = ("id", "score", "snippet", "subject", "year", "tags")
+SNIPPET_FRAGMENTS = 2
+SNIPPET_CHARS = 160
 
 def get_schema():
     return Schema(
@@ -14,72 +52,791 @@ def get_schema():
         subject=ID(stored=True),
         options=STORED,
         correct_answer=STORED,
-        explanation=STORED
+        explanation=STORED,
+        # Paper or file the question came from, and every copy merged into it by dedup
+        source=STORED,
+        appearances=STORED
     )
 
-def create_index():
-    if not os.path.exists(INDEX_DIR):
-        os.mkdir(INDEX_DIR)
-    
+def create_index(index_dir: str = INDEX_DIR):
+    if not os.path.exists(index_dir):
+        os.mkdir(index_dir)
+
     # Initialize index
-    create_in(INDEX_DIR, get_schema())
+    create_in(index_dir, get_schema())
 
-def add_documents(documents: list):
+
+class IndexManager:
     """
-    documents: List of dicts with keys matching schema
+    Process-wide owner of the Whoosh index.
+    Opens the index once, lends out pooled searchers and a shared query parser,
+    and swaps in fresh searchers when a commit bumps the index generation.
+    Searchers already lent out keep working on their snapshot and are closed
+    when they are returned.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self._lock = threading.RLock()
+        self._ix = None
+        self._parser = None
+        self._generation = None
+        self._pool = []
+        self._last_check = 0.0
+        self._listeners = []
+
+    def add_refresh_listener(self, callback):
+        """
+        Registers callback(generation) to run whenever a new index generation is picked up.
+        """
+        self._listeners.append(callback)
+
+    def get_index(self, create: bool = False):
+        """
+        Returns the open index, or None if it does not exist yet and create is False.
+        """
+        with self._lock:
+            if self._ix is None:
+                if not exists_in(self.index_dir):
+                    if not create:
+                        return None
+                    create_index(self.index_dir)
+                self._ix = open_dir(self.index_dir)
+                self._generation = self._ix.latest_generation()
+                self._last_check = time.monotonic()
+            return self._ix
+
+    @property
+    def parser(self):
+        ix = self.get_index()
+        if ix is None:
+            return None
+        with self._lock:
+            if self._parser is None:
+                parser = MultifieldParser(SEARCH_FIELDS, ix.schema)
+                parser.add_plugin(FuzzyTermPlugin())
+                self._parser = parser
+            return self._parser
+
+    @property
+    def generation(self):
+        """
+        Generation of the index that newly lent searchers will see (None if there is no index).
+        """
+        if self.get_index() is None:
+            return None
+        self._maybe_refresh()
+        return self._generation
+
+    def refresh(self):
+        """
+        Re-reads the index generation. Idle searchers from an older generation are
+        closed; searchers currently in use are closed when they are released.
+        """
+        ix = self.get_index()
+        if ix is None:
+            return
+        with self._lock:
+            self._last_check = time.monotonic()
+            latest = ix.latest_generation()
+            if latest == self._generation:
+                return
+            self._generation = latest
+            stale, self._pool = self._pool, []
+        for searcher in stale:
+            searcher.close()
+        for callback in self._listeners:
+            callback(latest)
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._last_check >= REFRESH_CHECK_INTERVAL:
+            self.refresh()
+
+    @contextmanager
+    def searcher(self):
+        """
+        Lends a searcher for the latest generation, or yields None if there is no index.
+        """
+        ix = self.get_index()
+        if ix is None:
+            yield None
+            return
+
+        self._maybe_refresh()
+        with self._lock:
+            generation = self._generation
+            searcher = self._pool.pop() if self._pool else None
+        if searcher is None:
+            searcher = ix.searcher()
+
+        try:
+            yield searcher
+        finally:
+            self._release(searcher, generation)
+
+    def _release(self, searcher, generation):
+        with self._lock:
+            if generation == self._generation and len(self._pool) < SEARCHER_POOL_SIZE:
+                self._pool.append(searcher)
+                return
+        searcher.close()
+
+    def writer(self, timeout: float = WRITE_LOCK_TIMEOUT):
+        """
+        Opens a writer. Whoosh allows one writer at a time across threads and processes,
+        so this waits up to timeout seconds for the write lock rather than failing at once.
+        """
+        writer = self.get_index(create=True).writer(timeout=timeout, delay=0.1)
+        # Indexes created before a field was added to the schema get it on their next commit
+        for name, field in get_schema().items():
+            if name not in writer.schema:
+                writer.add_field(name, field)
+        return writer
+
+
+index_manager = IndexManager()
+spell_corrector = SpellCorrector(index_manager, fields=SEARCH_FIELDS)
+facet_index = FacetIndex(index_manager)
+dedup_index = DedupIndex(INDEX_DIR)
+
+
+def _index_gauge(read):
+    def collect():
+        with index_manager.searcher() as searcher:
+            return None if searcher is None else read(searcher)
+    return collect
+
+
+# Read from a pooled searcher at scrape time, so a scrape costs no index I/O
+metrics.FunctionMetric("pyq_index_documents", "Live documents in the search index.",
+                       _index_gauge(lambda s: s.doc_count()))
+metrics.FunctionMetric("pyq_index_deleted_documents", "Deleted documents not yet merged away.",
+                       _index_gauge(lambda s: s.doc_count_all() - s.doc_count()))
+metrics.FunctionMetric("pyq_index_segments", "Segments in the current index generation.",
+                       _index_gauge(lambda s: len(s.reader().leaf_readers())))
+metrics.FunctionMetric("pyq_index_generation", "Index generation searchers are reading.",
+                       _index_gauge(lambda s: s.reader().generation()))
+
+
+class _MarkFormatter(HtmlFormatter):
+    """
+    HTML-escaped fragments with each matched term in a bare <mark> tag.
+    """
+
+    def format_token(self, text, token, replace=False):
+        return "<mark>%s</mark>" % html.escape(get_text(text, token, replace), quote=False)
+
+
+_snippet_fragmenter = ContextFragmenter(maxchars=SNIPPET_CHARS, surround=40)
+_snippet_formatter = _MarkFormatter(between=" … ")
+
+
+def _query_words(searcher, query, fieldname: str = "content") -> frozenset:
+    """
+    The indexed terms a query matches in fieldname, with fuzzy and prefix terms expanded.
+    """
+    field = searcher.schema[fieldname]
+    return frozenset(
+        field.from_bytes(text)
+        for name, text in query.existing_terms(searcher.reader(), expand=True)
+        if name == fieldname
+    )
+
+
+def _snippet(searcher, text: str, words: frozenset) -> str:
+    """
+    Up to SNIPPET_FRAGMENTS HTML-escaped fragments of text with the matched words in
+    <mark> tags, or the escaped start of text when no word matches.
     """
-    if not exists_in(INDEX_DIR):
-        create_index()
-    
-    ix = open_dir(INDEX_DIR)
-    writer = ix.writer()
-    
+    text = text or ""
+    fragments = ""
+    if words:
+        analyzer = searcher.schema["content"].analyzer
+        fragments = highlight(text, words, analyzer, _snippet_fragmenter, _snippet_formatter,
+                              top=SNIPPET_FRAGMENTS)
+    if fragments:
+        return fragments
+    head = text[:SNIPPET_CHARS]
+    return html.escape(head, quote=False) + ("…" if len(text) > SNIPPET_CHARS else "")
+
+
+def _hit_to_dict(r, score: float = None, fields=RESULT_FIELDS, snippet=None):
+    """
+    The requested fields of a hit or stored-fields dict. snippet() builds the
+    highlighted snippet from the stored content, and is only called when asked for.
+    """
+    hit = {}
+    for field in fields:
+        if field == "score":
+            hit["score"] = r.score if score is None else score
+        elif field == "snippet":
+            hit["snippet"] = snippet(r.get("content")) if snippet else None
+        else:
+            hit[field] = r.get(field)
+    return hit
+
+
+def _with_appearance(doc: dict, copy: dict) -> dict:
+    appearances = list(doc.get("appearances") or [appearance(doc)])
+    if all(a["id"] != str(copy["id"]) for a in appearances):
+        appearances.append(appearance(copy))
+    return {**doc, "appearances": appearances}
+
+
+def merge_duplicates(documents: list, stored_document=None, signatures: DedupIndex = None):
+    """
+    Folds near-duplicate questions (see dedup.py) into one canonical document each.
+    Returns (new, updated): documents to add, and already-indexed canonical documents
+    whose appearances list grew and must be rewritten. Duplicates themselves are not
+    indexed. stored_document(id) returns an indexed document's stored fields;
+    signatures is the DedupIndex to check against (the live one by default).
+    """
+    duplicates = (signatures or dedup_index).assign(documents)
+    new = {}
+    for doc in documents:
+        if str(doc["id"]) in duplicates:
+            continue
+        if not doc.get("appearances"):
+            # A re-indexed canonical question keeps the copies already merged into it
+            existing = stored_document(str(doc["id"])) if stored_document else None
+            doc = {**doc, "appearances": (existing or {}).get("appearances") or [appearance(doc)]}
+        new[str(doc["id"])] = doc
+
+    updated = {}
+    for doc in documents:
+        canonical_id = duplicates.get(str(doc["id"]))
+        if canonical_id is None:
+            continue
+        if canonical_id in new:
+            new[canonical_id] = _with_appearance(new[canonical_id], doc)
+            continue
+        canonical = updated.get(canonical_id) or (stored_document(canonical_id) if stored_document else None)
+        if canonical is None:
+            # The canonical question was deleted; this copy takes its place
+            new[str(doc["id"])] = {**doc, "appearances": [appearance(doc)]}
+            continue
+        updated[canonical_id] = _with_appearance(canonical, doc)
+    return list(new.values()), list(updated.values())
+
+
+def _write_documents(writer, documents):
+    """
+    Adds documents, replacing any indexed document with the same id. update_document
+    opens a reader over every segment on each call; here one searcher serves the whole
+    batch, and ids not in the index yet (the usual case when ingesting) are just added.
+    """
+    documents = list({str(doc["id"]): doc for doc in documents}.values())
+    with writer.searcher() as searcher:
+        reader = searcher.reader()
+        for doc in documents:
+            doc_id = str(doc["id"])
+            # A term lookup only: no postings are read for new ids
+            if ("id", doc_id) in reader:
+                writer.delete_by_term("id", doc_id, searcher=searcher)
     for doc in documents:
         writer.add_document(**doc)
-    
+
+
+def _commit_documents(manager: IndexManager, documents: list):
+    """
+    Merges near-duplicates, commits them to manager's index in one segment and
+    embeds the new documents. Shared by add_documents and BulkIndexWriter.flush.
+    """
+    from app.services import vector_index
+    writer = manager.writer()
+    try:
+        # Canonical documents are read under the write lock: a copy merged by a
+        # concurrent commit would otherwise be lost when this one rewrites them
+        with writer.searcher() as searcher:
+            new, updated = merge_duplicates(documents, lambda doc_id: searcher.document(id=doc_id))
+        _write_documents(writer, new + updated)
+        staging = staging_path(manager.index_dir)
+        if os.path.isdir(staging):
+            # A rebuild is running and would drop this commit when it swaps in
+            with open(os.path.join(staging, REPLAY_NAME), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(doc, default=str) + "\n" for doc in documents)
+    except Exception:
+        writer.cancel()
+        raise
+
+    with metrics.ingest_stage_seconds.time(stage="index_commit"):
+        writer.commit()
+    metrics.ingest_documents_total.inc(len(new) + len(updated))
+    manager.refresh()
+    # Outside the lock: embedding can wait on the Gemini rate limit, and never raises
+    vector_index.index_documents(new)
+
+
+def add_documents(documents: list):
+    """
+    documents: List of dicts with keys matching schema
+    Near-duplicates of indexed questions are merged into them rather than added.
+    """
+    _commit_documents(index_manager, documents)
+
+
+def journal_path(index_dir: str = INDEX_DIR) -> str:
+    return os.path.join(index_dir, JOURNAL_NAME)
+
+
+def staging_path(index_dir: str = INDEX_DIR) -> str:
+    """
+    Where replace_all_documents builds the next index; it exists only while a rebuild runs.
+    """
+    return index_dir + ".staging"
+
+
+def read_journal(path: str = None) -> set:
+    """
+    Ids recorded as committed by BulkIndexWriter (empty if there is no journal yet).
+    """
+    path = path or journal_path()
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+class BulkIndexWriter:
+    """
+    Buffers documents and commits them as one segment every batch_size documents
+    or flush_interval seconds, instead of one commit per document.
+    After each commit the ids are appended to a journal, so an interrupted run can
+    resume exactly where the last commit left off. Documents replace any indexed
+    document with the same id, so replaying a batch that was committed but not
+    journaled (a crash between the two) does not create duplicates.
+
+        with BulkIndexWriter() as writer:
+            for doc in docs:
+                writer.add(doc)
+    """
+
+    def __init__(self, batch_size: int = BULK_BATCH_SIZE, flush_interval: float = BULK_FLUSH_INTERVAL,
+                 journal: str = None, manager: IndexManager = None, on_flush=None):
+        self.manager = manager or index_manager
+        # on_flush(batch) runs before each commit, e.g. to save the batch to the question table
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal = journal or journal_path(self.manager.index_dir)
+        self.committed = 0
+        self._buffer = []
+        self._first_buffered = None
+
+    def add(self, doc: dict):
+        if not self._buffer:
+            self._first_buffered = time.monotonic()
+        self._buffer.append(doc)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Commits the buffer if its oldest document has waited flush_interval seconds.
+        Long-running producers should call this when idle.
+        """
+        if self._buffer and time.monotonic() - self._first_buffered >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        if self.on_flush:
+            self.on_flush(batch)
+
+        _commit_documents(self.manager, batch)
+
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.writelines(f"{doc['id']}\n" for doc in batch)
+            f.flush()
+            os.fsync(f.fileno())
+        self.committed += len(batch)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _live_ids(reader, prefix: str = None):
+    """
+    Ids of the live documents, segment by segment. The id term list still holds
+    deleted documents until their segment is merged, so in a segment with deletions
+    the ids of its deleted documents are read once (from their stored fields) and an
+    id is kept only if the segment has more documents with it than deleted ones.
+    """
+    for leaf, _ in reader.leaf_readers():
+        terms = leaf.expand_prefix("id", prefix) if prefix else leaf.lexicon("id")
+        ids = (t.decode("utf-8") if isinstance(t, bytes) else t for t in terms)
+        if not leaf.has_deletions():
+            yield from ids
+            continue
+        deleted = Counter(
+            leaf.stored_fields(docnum).get("id") for docnum in range(leaf.doc_count_all()) if leaf.is_deleted(docnum)
+        )
+        for doc_id in ids:
+            if doc_id not in deleted or leaf.doc_frequency("id", doc_id) > deleted[doc_id]:
+                yield doc_id
+
+
+def indexed_ids(prefix: str = None, include_journal: bool = True) -> set:
+    """
+    All document ids currently in the index (optionally only those starting with
+    prefix), read in one pass over the id field's term list rather than one
+    lookup per document. With include_journal, ids from the BulkIndexWriter
+    journal are added too.
+    """
+    ids = set()
+    with index_manager.searcher() as searcher:
+        if searcher is not None:
+            ids.update(_live_ids(searcher.reader(), prefix))
+
+    if include_journal:
+        journaled = read_journal(journal_path(index_manager.index_dir))
+        ids.update(i for i in journaled if not prefix or i.startswith(prefix))
+    return ids
+
+
+def _signature_batch(batch):
+    return dedup.signatures_for([doc.get("content") for doc in batch])
+
+
+def _embedding_batch(batch):
+    from app.services import vector_index
+    return vector_index.embed_batch(batch)
+
+
+def _map(pool, func, batches, window: int):
+    """
+    Yields (batch, func(batch)) in order, computed by the pool when there is one,
+    with at most window batches in flight so the source is still streamed.
+    """
+    if pool is None:
+        for batch in batches:
+            yield batch, func(batch)
+        return
+    pending = deque()
+    for batch in batches:
+        pending.append((batch, pool.submit(func, batch)))
+        if len(pending) >= window:
+            done, future = pending.popleft()
+            yield done, future.result()
+    while pending:
+        done, future = pending.popleft()
+        yield done, future.result()
+
+
+def replace_all_documents(documents, procs: int = 1) -> int:
+    """
+    Rebuilds the index, its dedup signatures and its vectors in a staging directory,
+    then swaps them in (see swap_in_index): searches keep running against the old
+    index until the new one is complete. The journal is rewritten to match.
+    documents: a re-iterable collection, or a callable returning a fresh iterator
+    (e.g. a database cursor). It is read twice, first to find near-duplicates and
+    then to write the canonical questions, so the source is streamed rather than
+    held in memory.
+    procs > 1 computes signatures in that many worker processes and indexes with
+    Whoosh's multi-process writer, one segment per process. Questions whose text is
+    unchanged keep their live vectors; the rest are embedded by the workers with a
+    local embedder, or in this process with Gemini so that one gemini_limiter
+    throttles every call.
+    Documents committed to the live index meanwhile (e.g. by ingest jobs) are recorded
+    in the staging directory and replayed into the new index before it is swapped in.
+    Returns the number of documents read.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from app.services import vector_index
+
+    read = documents if callable(documents) else (lambda: iter(documents))
+    staging = staging_path(index_manager.index_dir)
+    # Created under the lock: a commit either lands before the source is read or is recorded for replay
+    with _live_write_lock():
+        shutil.rmtree(staging, ignore_errors=True)
+        staged_ix = create_in(_makedirs(staging), get_schema())
+    staged_dedup = DedupIndex(staging)
+    staged_vectors = vector_index.staging_store(os.path.join(staging, "vectors"))
+
+    pool = ProcessPoolExecutor(max_workers=procs) if procs > 1 else None
+    try:
+        # Pass 1: signatures only; note where each duplicate appeared
+        ids = []
+        merged = {}
+        for batch, signatures in _map(pool, _signature_batch, _batched(read(), BULK_BATCH_SIZE), 2 * procs):
+            ids.extend(str(doc["id"]) for doc in batch)
+            by_id = {str(doc["id"]): doc for doc in batch}
+            for doc_id, canonical_id in staged_dedup.assign(batch, signatures).items():
+                merged.setdefault(canonical_id, []).append(appearance(by_id[doc_id]))
+        duplicates = {a["id"] for copies in merged.values() for a in copies}
+
+        def canonical_batches():
+            for batch in _batched(read(), BULK_BATCH_SIZE):
+                canonical = [
+                    {**doc, "appearances": [appearance(doc)] + merged.get(str(doc["id"]), [])}
+                    for doc in batch if str(doc["id"]) not in duplicates
+                ]
+                if canonical:
+                    yield canonical
+
+        staged = deque()
+
+        def unembedded_batches():
+            for batch in canonical_batches():
+                reused = vector_index.stored_vectors(batch)
+                staged.append((batch, reused))
+                yield [doc for doc in batch if str(doc["id"]) not in reused]
+
+        # Pass 2: write the canonical questions with their appearances and embeddings
+        embed_pool = None if vector_index.get_embedder().remote else pool
+        writer = staged_ix.writer(procs=procs, multisegment=True) if procs > 1 else staged_ix.writer()
+        try:
+            for _, vectors in _map(embed_pool, _embedding_batch, unembedded_batches(), 2 * procs):
+                batch, reused = staged.popleft()
+                # Without vectors (embedding failed, or nothing needed it) only the reused ones are added
+                embedded = batch if vectors is not None else [doc for doc in batch if str(doc["id"]) in reused]
+                vector_index.index_documents(embedded, store=staged_vectors, vectors=vectors, reused=reused)
+                for doc in batch:
+                    writer.add_document(**doc)
+        except BaseException:
+            writer.cancel()
+            raise
+        writer.commit()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    vector_index.prepare(staged_vectors)
+    # No commit can land between the replay and the swap
+    with _live_write_lock():
+        ids.extend(_replay(staging, staged_ix, staged_dedup, staged_vectors))
+        staged_ix.close()
+        vector_index.publish(staged_vectors)
+        swap_in_index(staging)
+
+    path = journal_path(index_manager.index_dir)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.writelines(f"{i}\n" for i in dict.fromkeys(ids))
+    os.replace(path + ".tmp", path)
+    return len(ids)
+
+
+def _replay(staging: str, staged_ix, staged_dedup: DedupIndex, staged_vectors) -> list:
+    """
+    Applies the documents committed to the live index during a rebuild to the staged
+    index, its signatures and its vectors, as _commit_documents applied them to the
+    live ones. Returns their ids.
+    """
+    from app.services import vector_index
+
+    path = os.path.join(staging, REPLAY_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        documents = [json.loads(line) for line in f if line.strip()]
+    writer = staged_ix.writer()
+    try:
+        with writer.searcher() as searcher:
+            new, updated = merge_duplicates(documents, lambda doc_id: searcher.document(id=doc_id), staged_dedup)
+        _write_documents(writer, new + updated)
+    except BaseException:
+        writer.cancel()
+        raise
     writer.commit()
+    vector_index.index_documents(new, store=staged_vectors, reused=vector_index.stored_vectors(new))
+    print(f"Replayed {len(documents)} documents committed during the rebuild.")
+    return [str(doc["id"]) for doc in documents]
+
+
+def _makedirs(path: str) -> str:
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextmanager
+def _live_write_lock():
+    """
+    Holds the live index's write lock, waiting for any in-flight commit (e.g. an
+    ingest job) to finish first.
+    """
+    lock = index_manager.get_index(create=True).lock("WRITELOCK")
+    while not lock.acquire(blocking=False):
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def swap_in_index(staging_dir: str):
+    """
+    Publishes a fully built index from staging_dir as the next generation of the live
+    index: its segment files are moved in (segment names are random, so nothing
+    collides) and a new TOC listing only them is written. The caller holds the live
+    write lock (see _live_write_lock). The TOC write is an atomic rename, so readers
+    see either the old index or the new one. Files of the old generation are removed
+    as on any commit, and staging_dir is removed, which ends the rebuild for commits
+    that check for it.
+    """
+    from whoosh.index import TOC, clean_files
+
+    staged = open_dir(staging_dir)
+    segments = staged._segments()
+    schema = staged.schema
+    segment_file = TOC._segment_pattern(staged.indexname)
+
+    live = index_manager.get_index(create=True)
+    for name in os.listdir(staging_dir):
+        if segment_file.match(name):
+            os.replace(os.path.join(staging_dir, name), os.path.join(index_manager.index_dir, name))
+    generation = live.latest_generation() + 1
+    TOC(schema, segments, generation).write(live.storage, live.indexname)
+    clean_files(live.storage, live.indexname, generation, segments)
+    signatures = os.path.join(staging_dir, dedup.SIGNATURES_NAME + ".sig")
+    if os.path.exists(signatures):
+        os.replace(signatures, os.path.join(index_manager.index_dir, dedup.SIGNATURES_NAME + ".sig"))
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    index_manager.refresh()
+
+
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def index_is_empty() -> bool:
+    with index_manager.searcher() as searcher:
+        return searcher is None or searcher.doc_count() == 0
 
 
 def document_exists(doc_id):
-    if not exists_in(INDEX_DIR):
-        return False
-    ix = open_dir(INDEX_DIR)
-    with ix.searcher() as searcher:
+    with index_manager.searcher() as searcher:
+        if searcher is None:
+            return False
         # Check if ID exists
         docnum = searcher.document_number(id=str(doc_id))
         return docnum is not None
 
-def search_index(query_str: str, limit: int = 10):
-    if not exists_in(INDEX_DIR):
-        return []
-        
-    ix = open_dir(INDEX_DIR)
-    with ix.searcher() as searcher:
+def search_index(query_str: str, limit: int = 10, mode: str = "bm25", fields=RESULT_FIELDS):
+    return search_page(query_str, page=1, page_size=limit, with_facets=False, mode=mode, fields=fields)["results"]
+
+def _fuse(searcher, keyword_hits, query_str: str, allowed, limit: int):
+    """
+    Reciprocal rank fusion of the BM25 hits with the nearest neighbours of the query
+    embedding: score = sum of 1 / (RRF_K + rank) over the rankings a document is in.
+    Returns (docnum, score) pairs, best first.
+    """
+    from app.services import vector_index
+
+    scores = {}
+    for rank, hit in enumerate(keyword_hits):
+        scores[hit.docnum] = 1.0 / (RRF_K + rank + 1)
+    try:
+        with metrics.search_stage_seconds.time(stage="vector"):
+            neighbours = vector_index.search(query_str, k=HYBRID_DEPTH)
+    except Exception as e:
+        print(f"Vector search error: {e}")
+        neighbours = []
+    rank = 0
+    for doc_id, similarity in neighbours:
+        if similarity <= 0:
+            break
+        docnum = searcher.document_number(id=doc_id)
+        if docnum is None or (allowed is not None and docnum not in allowed):
+            continue
+        scores[docnum] = scores.get(docnum, 0.0) + 1.0 / (RRF_K + rank + 1)
+        rank += 1
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+def empty_page(page: int = 1, page_size: int = 10) -> dict:
+    return {"results": [], "total": 0, "page": page, "page_size": page_size, "facets": {}}
+
+def search_page(query_str: str, page: int = 1, page_size: int = 10, filters: dict = None, with_facets: bool = True, mode: str = "bm25",
+                fields=DEFAULT_RESULT_FIELDS, raise_errors: bool = False):
+    """
+    One page of hits plus the total hit count and facet counts.
+    filters: {facet field: value}, e.g. {"subject": "Physics", "year": "2024"}
+    mode: "bm25" for keyword ranking, or "hybrid" to fuse it with embedding similarity.
+    Hybrid ranking covers the top HYBRID_DEPTH of each list; total stays the keyword hit count.
+    fields: which of RESULT_FIELDS each hit carries.
+    A failed search returns an empty page, or raises with raise_errors (e.g. so it is not cached).
+    """
+    filters = {f: v for f, v in (filters or {}).items() if v}
+    response = empty_page(page, page_size)
+
+    with index_manager.searcher() as searcher:
+        if searcher is None:
+            return response
+
         # Search efficiently across content, tags, subject, and year
-        parser = MultifieldParser(["content", "tags", "subject", "year"], ix.schema)
-        parser.add_plugin(FuzzyTermPlugin())
-        
+        parser = index_manager.parser
+
+        stage = metrics.search_stage_seconds
+        metrics.search_queries_total.inc(mode=mode)
         try:
-            # 1. Exact/Standard Search
-            query = parser.parse(query_str)
-            results = searcher.search(query, limit=limit)
-            
-            # 2. Results found? Return them.
-            if len(results) > 0:
-                 return [{"id": r["id"], "content": r["content"], "score": r.score, "subject": r.get("subject"), "year": r.get("year"), "tags": r.get("tags"), "options": r.get("options"), "correct_answer": r.get("correct_answer"), "explanation": r.get("explanation")} for r in results]
-
-            # 3. No results? Try Fuzzy Search (Typo Tolerance)
-            # Append ~1 (edit distance 1) to terms.
-            terms = query_str.split()
-            # Only apply fuzziness to terms longer than 3 chars to avoid noise
-            fuzzy_terms = [f"{t}~1" if len(t) > 3 and t.isalnum() else t for t in terms]
-            fuzzy_query_str = " ".join(fuzzy_terms)
-            
-            fuzzy_query = parser.parse(fuzzy_query_str)
-            results = searcher.search(fuzzy_query, limit=limit)
-            
-            return [{"id": r["id"], "content": r["content"], "score": r.score, "subject": r.get("subject"), "year": r.get("year"), "tags": r.get("tags"), "options": r.get("options"), "correct_answer": r.get("correct_answer"), "explanation": r.get("explanation")} for r in results]
+            # Fix misspelled terms up front so typo queries need a single search
+            with stage.time(stage="spell_correction"):
+                corrected = spell_corrector.correct_query(query_str)
+            # correct_query rejoins terms with single spaces, so compare terms, not strings
+            if corrected.split() != query_str.split():
+                metrics.search_fuzzy_fallback_total.inc()
+            with stage.time(stage="parse"):
+                query = parser.parse(corrected)
+            allowed = facet_index.filter_for(searcher, filters) if filters else None
+            if allowed is not None and not allowed:
+                # Nothing can match; Whoosh would treat the empty filter as no filter at all
+                if with_facets:
+                    with stage.time(stage="facets"):
+                        response["facets"] = facet_index.counts(searcher, query, filters)
+                return response
+
+            snippet = None
+            if "snippet" in fields:
+                words = _query_words(searcher, query)
+                snippet = lambda text: _snippet(searcher, text, words)
+            if mode == "hybrid":
+                with stage.time(stage="search"):
+                    results = searcher.search(query, limit=max(page * page_size, HYBRID_DEPTH), filter=allowed)
+                fused = _fuse(searcher, results, query_str, allowed, page * page_size)
+                with stage.time(stage="hits"):
+                    response["results"] = [
+                        _hit_to_dict(searcher.stored_fields(docnum), score, fields, snippet)
+                        for docnum, score in fused[(page - 1) * page_size:]
+                    ]
+                response["total"] = max(len(results), len(fused))
+            else:
+                with stage.time(stage="search"):
+                    results = searcher.search(query, limit=page * page_size, filter=allowed)
+                with stage.time(stage="hits"):
+                    response["results"] = [_hit_to_dict(r, None, fields, snippet) for r in results[(page - 1) * page_size:]]
+                response["total"] = len(results)
+            if with_facets:
+                with stage.time(stage="facets"):
+                    response["facets"] = facet_index.counts(searcher, query, filters)
+            return response
 
         except Exception as e:
+            metrics.search_errors_total.inc()
             print(f"Search error: {e}")
-            return []
+            if raise_errors:
+                raise
+            return empty_page(page, page_size)
+
+def get_question(doc_id: str, fields=RESULT_FIELDS):
+    """
+    Stored fields of one question, read by document number without running a query.
+    None if no live document has that id.
+    """
+    with index_manager.searcher() as searcher:
+        if searcher is None:
+            return None
+        docnum = searcher.document_number(id=doc_id)
+        if docnum is None:
+            return None
+        return _hit_to_dict(searcher.stored_fields(docnum), fields=[f for f in fields if f not in ("score", "snippet")])
@@ -0,0 +1,148 @@
+import re
+import threading
+from whoosh.analysis import STOP_WORDS
+from app.services.rebuilder import CoalescingRebuild
+
+# Matches the old fuzzy fallback, which rewrote terms to term~1
+MAX_EDIT_DISTANCE = 1
+# Shorter terms are left alone to avoid noisy corrections
+MIN_TERM_LENGTH = 4
+VOCAB_FIELDS = ("content", "tags")
+
+# Query operators must never be "corrected"
+_OPERATORS = {"AND", "OR", "NOT", "ANDNOT", "ANDMAYBE", "TO"}
+_WORD_SPLIT = re.compile(r"[\s,]+")
+
+
+def _has_digit(word: str) -> bool:
+    return any(c.isdigit() for c in word)
+
+
+def _deletes(word: str, distance: int) -> set:
+    """
+    All strings reachable from word by removing up to `distance` characters.
+    """
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions),
+    or limit + 1 when the lengths alone rule out a match.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def index_vocabulary(reader, fields=VOCAB_FIELDS) -> dict:
+    """
+    word -> document frequency over the indexed terms of fields, with comma-joined
+    tag terms split into words and counts summed across fields.
+    """
+    vocab = {}
+    for field in fields:
+        if field not in reader.schema:
+            continue
+        for btext, terminfo in reader.iter_field(field):
+            for word in _WORD_SPLIT.split(btext.decode("utf-8").lower()):
+                if word.isalnum():
+                    vocab[word] = vocab.get(word, 0) + terminfo.doc_frequency()
+    return vocab
+
+
+class SpellCorrector:
+    """
+    Symmetric-delete spelling correction over the indexed vocabulary of fields
+    (every field the query parser searches, so an exact subject or year is never
+    "corrected"). Terms containing digits, such as years, are left alone.
+    The lookup table is rebuilt in the background whenever the index manager
+    picks up a new generation; queries keep using the previous table until the
+    new one is ready.
+    """
+
+    def __init__(self, index_manager, max_distance: int = MAX_EDIT_DISTANCE, fields=VOCAB_FIELDS):
+        self.index_manager = index_manager
+        self.max_distance = max_distance
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        # (word -> document frequency, deleted form -> words), swapped as one unit
+        self._state = None
+        self._generation = None
+        self._rebuilder = CoalescingRebuild(self.rebuild, "spellcheck-rebuild")
+        index_manager.add_refresh_listener(self._on_refresh)
+
+    def _on_refresh(self, generation):
+        if self._state is not None and generation != self._generation:
+            self._rebuilder.request()
+
+    def rebuild(self):
+        with self.index_manager.searcher() as searcher:
+            if searcher is None:
+                return
+            reader = searcher.reader()
+            generation = reader.generation()
+            vocab = index_vocabulary(reader, self.fields)
+
+        table = {}
+        for word in vocab:
+            # Nothing is corrected into a number either
+            if len(word) < MIN_TERM_LENGTH - self.max_distance or _has_digit(word):
+                continue
+            for deleted in _deletes(word, self.max_distance):
+                table.setdefault(deleted, []).append(word)
+
+        with self._lock:
+            self._state, self._generation = (vocab, table), generation
+
+    def _correct_term(self, term: str, vocab: dict, table: dict) -> str:
+        word = term.lower()
+        # Stop words are never indexed, so they are not misspellings
+        if word in vocab or word in STOP_WORDS:
+            return term
+
+        best, best_key = None, None
+        for deleted in _deletes(word, self.max_distance):
+            for candidate in table.get(deleted, ()):
+                distance = _edit_distance(word, candidate, self.max_distance)
+                if distance > self.max_distance:
+                    continue
+                # Closest first, then the most common word in the index
+                key = (distance, -vocab[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best or term
+
+    def correct_query(self, query_str: str) -> str:
+        """
+        Replaces misspelled plain terms with their closest indexed word.
+        Field queries, phrases, wildcards and operators are left untouched.
+        """
+        if self._state is None:
+            self.rebuild()
+            if self._state is None:
+                return query_str
+        vocab, table = self._state
+
+        terms = query_str.split()
+        corrected = [
+            self._correct_term(t, vocab, table)
+            if len(t) >= MIN_TERM_LENGTH and t.isalnum() and not _has_digit(t) and t not in _OPERATORS else t
+            for t in terms
+        ]
+        return " ".join(corrected)
@@ -0,0 +1,87 @@
+import bisect
+import threading
+from typing import List, Tuple
+import numpy as np
+from whoosh.analysis import STOP_WORDS
+from app.services.search_engine import index_manager
+from app.services.spellcheck import index_vocabulary
+from app.services.rebuilder import CoalescingRebuild
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+# Single letters, bare numbers and stop words make poor completions
+MIN_SUGGEST_LENGTH = 2
+_PREFIX_END = chr(0x10FFFF)
+
+
+class SuggestIndex:
+    """
+    Prefix completions over the indexed words of `content` and `tags`, weighted by
+    document frequency. Words are held in one sorted list, so the completions of
+    a prefix are a contiguous slice found with two binary searches, and the top-k
+    of the slice comes from an argpartition over its weights.
+    Rebuilt in the background when the index manager picks up a new generation;
+    lookups keep using the previous arrays until the new ones are ready.
+    """
+
+    def __init__(self, index_manager):
+        self.index_manager = index_manager
+        self._lock = threading.Lock()
+        # (sorted words, weights aligned with them), swapped as one unit
+        self._state = None
+        self._generation = None
+        self._rebuilder = CoalescingRebuild(self.rebuild, "suggest-rebuild")
+        index_manager.add_refresh_listener(self._on_refresh)
+
+    def _on_refresh(self, generation):
+        if generation != self._generation:
+            self.start_rebuild()
+
+    def start_rebuild(self):
+        self._rebuilder.request()
+
+    def rebuild(self):
+        with self.index_manager.searcher() as searcher:
+            if searcher is None:
+                return
+            reader = searcher.reader()
+            generation = reader.generation()
+            vocab = index_vocabulary(reader)
+
+        words = sorted(w for w in vocab if len(w) >= MIN_SUGGEST_LENGTH and not w.isdigit() and w not in STOP_WORDS)
+        weights = np.fromiter((vocab[w] for w in words), dtype=np.int64, count=len(words))
+        with self._lock:
+            self._state, self._generation = (words, weights), generation
+
+    def complete(self, prefix: str, limit: int = SUGGEST_LIMIT) -> List[Tuple[str, int]]:
+        """
+        Up to limit (word, document frequency) pairs starting with prefix, most frequent first.
+        """
+        if self._state is None:
+            self.rebuild()
+            if self._state is None:
+                return []
+        words, weights = self._state
+
+        prefix = prefix.lower()
+        lo = bisect.bisect_left(words, prefix)
+        hi = bisect.bisect_right(words, prefix + _PREFIX_END, lo)
+        if hi - lo > limit:
+            top = lo + np.argpartition(-weights[lo:hi], limit)[:limit]
+        else:
+            top = range(lo, hi)
+        return sorted(((words[i], int(weights[i])) for i in top), key=lambda c: (-c[1], c[0]))
+
+    def suggest(self, query: str, limit: int = SUGGEST_LIMIT) -> List[dict]:
+        """
+        Completions of the last word of query, each returned as the whole query.
+        A trailing space means the last word is finished, so nothing is suggested.
+        """
+        if not query.strip() or query[-1].isspace():
+            return []
+        head, _, last = query.rpartition(" ")
+        head = head + " " if head else ""
+        return [{"text": head + word, "weight": weight} for word, weight in self.complete(last, limit)]
+
+
+suggest_index = SuggestIndex(index_manager)
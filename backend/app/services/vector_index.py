@@ -0,0 +1,507 @@
+import os
+import re
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.services.search_engine import index_manager
+from app.services.rate_limiter import gemini_limiter, query_limiter, with_retries_blocking
+
+load_dotenv()
+
+# "gemini" embeds with the Gemini embedding API; "hashing" is a local, dependency-free
+# bag-of-words embedder for offline use. "auto" picks gemini when an API key is set.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto")
+GEMINI_EMBEDDING_MODEL = "text-embedding-004"
+GEMINI_EMBED_BATCH = 100  # texts per embed_content call (API limit)
+GEMINI_EMBED_RETRIES = 3
+HASHING_DIM = 512
+# "numpy" keeps vectors in a float32 matrix next to the Whoosh index; "pgvector" stores them in Postgres
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "numpy")
+VECTOR_DIR = os.getenv("VECTOR_DIR", "vectordir")
+# Above this many vectors an HNSW graph (hnswlib, if installed) replaces the brute-force scan
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "50000"))
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of words and word bigrams. No model, no network;
+    captures shared vocabulary rather than meaning, so it is a fallback only.
+    """
+    name = f"hashing-{HASHING_DIM}"
+    dim = HASHING_DIM
+    remote = False
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str], query: bool = False) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        return out
+
+
+class GeminiEmbedder:
+    """
+    Embeddings from the Gemini API. Documents are throttled by the process-wide
+    gemini_limiter, so indexing shares the quota with OCR and explanations; queries
+    draw on query_limiter instead and never wait. Synchronous: callers on an
+    event loop run it in a thread (see ingest_manual.index_stage).
+    """
+    name = GEMINI_EMBEDDING_MODEL
+    dim = 768
+    remote = True  # calls must stay in a process whose gemini_limiter sees them all
+
+    def _embed_batch(self, batch: List[str], config, query: bool):
+        from app.services.llm import get_client
+
+        def call():
+            return get_client().models.embed_content(model=GEMINI_EMBEDDING_MODEL, contents=batch, config=config)
+
+        if query:
+            # A search must not wait for a token or a retry; _fuse falls back to BM25 on error
+            return with_retries_blocking("embed", call, max_retries=1, limiter=query_limiter, wait=0)
+        return with_retries_blocking("embed", call, max_retries=GEMINI_EMBED_RETRIES, limiter=gemini_limiter)
+
+    def embed(self, texts: Sequence[str], query: bool = False) -> np.ndarray:
+        from google.genai import types
+
+        config = types.EmbedContentConfig(task_type="RETRIEVAL_QUERY" if query else "RETRIEVAL_DOCUMENT")
+        vectors = []
+        for start in range(0, len(texts), GEMINI_EMBED_BATCH):
+            result = self._embed_batch(list(texts[start:start + GEMINI_EMBED_BATCH]), config, query)
+            vectors.extend(e.values for e in result.embeddings)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+_embedder = None
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        backend = EMBEDDING_BACKEND
+        if backend == "auto":
+            from app.core.config import settings
+            backend = "gemini" if settings.GEMINI_API_KEY else "hashing"
+        _embedder = GeminiEmbedder() if backend == "gemini" else HashingEmbedder()
+    return _embedder
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embed_documents(texts: Sequence[str]) -> np.ndarray:
+    """
+    Unit-length float32 embeddings for a batch of document texts.
+    """
+    return _normalize(get_embedder().embed(texts))
+
+
+@lru_cache(maxsize=1024)
+def embed_query(text: str) -> np.ndarray:
+    # Cached: repeated queries must not pay for another embedding call
+    vector = _normalize(get_embedder().embed([text], query=True))[0]
+    vector.flags.writeable = False
+    return vector
+
+
+class NumpyVectorStore:
+    """
+    Append-only float32 matrix of unit vectors with a parallel id list, searched
+    with one matrix-vector product and argpartition.
+    On disk: <model>.f32 (raw rows) and <model>.ids (one "id<TAB>content hash" per
+    line). Rows are only ever appended, so other processes pick up new vectors by
+    reading the tail; a re-embedded id gets a new row and the newest row wins.
+    """
+
+    def __init__(self, vector_dir: str = VECTOR_DIR):
+        self.vector_dir = vector_dir
+        self._lock = threading.Lock()
+        self._model = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._hashes: List[str] = []
+        self._row_of = {}
+        self._rows_read = 0
+        self._file_id = None
+        self._ann = None
+        self._ann_building = False
+
+    def _paths(self, model: str):
+        base = os.path.join(self.vector_dir, model)
+        return base + ".f32", base + ".ids"
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, model: str, hashes: Sequence[str] = None):
+        os.makedirs(self.vector_dir, exist_ok=True)
+        vec_path, ids_path = self._paths(model)
+        # Vectors before ids: a reader never sees an id whose row is not complete
+        with open(vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(ids_path, "a", encoding="utf-8") as f:
+            f.writelines(f"{i}\t{h or ''}\n" for i, h in zip(ids, hashes or [None] * len(ids)))
+
+    def reset(self, model: str):
+        for path in self._paths(model):
+            if os.path.exists(path):
+                os.remove(path)
+        with self._lock:
+            self._model = None
+
+    def _load(self, model: str, dim: int):
+        """
+        Reads rows appended since the last call (or everything, after a reset).
+        """
+        vec_path, ids_path = self._paths(model)
+        if not os.path.exists(ids_path):
+            self._clear(model, dim, None)
+            return
+        stat = os.stat(ids_path)
+        file_id = (stat.st_ino, stat.st_dev)
+        if self._model != model or self._file_id != file_id or stat.st_size < self._rows_read:
+            self._clear(model, dim, file_id)
+
+        with open(ids_path, "rb") as f:
+            f.seek(self._rows_read)
+            tail = f.read()
+        # Ignore a line that is still being written
+        lines = tail[:tail.rfind(b"\n") + 1].decode("utf-8").splitlines()
+        if not lines:
+            return
+        first_row = len(self._ids)
+        rows = np.fromfile(vec_path, dtype=np.float32, count=len(lines) * dim, offset=first_row * dim * 4)
+        lines = lines[:len(rows) // dim]
+        rows = rows[:len(lines) * dim].reshape(len(lines), dim)
+        # Files written before content hashes were recorded have bare ids
+        new_ids, _, new_hashes = zip(*(line.partition("\t") for line in lines)) if lines else ((), (), ())
+
+        self._matrix = np.vstack([self._matrix, rows]) if len(self._ids) else rows
+        self._ids.extend(new_ids)
+        self._hashes.extend(new_hashes)
+        for row, doc_id in enumerate(new_ids, start=first_row):
+            previous = self._row_of.get(doc_id)
+            if previous is not None:
+                self._ids[previous] = None  # superseded
+            self._row_of[doc_id] = row
+        self._rows_read += sum(len(line.encode("utf-8")) + 1 for line in lines)
+        if self._ann is not None:
+            if len(self._ids) > self._ann.get_max_elements():
+                self._ann.resize_index(2 * len(self._ids))
+            self._ann.add_items(rows, np.arange(first_row, first_row + len(new_ids)))
+        elif len(self._ids) >= ANN_MIN_VECTORS:
+            self._start_ann_build()
+
+    def _clear(self, model: str, dim: int, file_id):
+        self._model, self._matrix, self._ids, self._hashes = model, np.zeros((0, dim), np.float32), [], []
+        self._row_of, self._rows_read, self._file_id, self._ann = {}, 0, file_id, None
+
+    def stored(self, ids: Sequence[str], hashes: Sequence[str], model: str, dim: int) -> Dict[str, np.ndarray]:
+        """
+        id -> stored vector for the ids whose newest row has the given content hash.
+        """
+        with self._lock:
+            self._load(model, dim)
+            found = {}
+            for doc_id, digest in zip(ids, hashes):
+                row = self._row_of.get(doc_id)
+                if row is not None and self._hashes[row] == digest:
+                    found[doc_id] = self._matrix[row]
+            return found
+
+    def _start_ann_build(self):
+        try:
+            import hnswlib
+        except ImportError:
+            return
+        if self._ann_building:
+            return
+        self._ann_building = True
+        matrix = self._matrix
+
+        def build():
+            index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+            index.init_index(max_elements=max(2 * len(matrix), 1024), ef_construction=200, M=16)
+            index.add_items(matrix, np.arange(len(matrix)))
+            index.set_ef(128)
+            with self._lock:
+                # Rows appended while building are added before the graph goes live
+                if len(self._matrix) > len(matrix):
+                    index.resize_index(max(2 * len(self._matrix), index.get_max_elements()))
+                    index.add_items(self._matrix[len(matrix):], np.arange(len(matrix), len(self._matrix)))
+                self._ann = index
+                self._ann_building = False
+
+        threading.Thread(target=build, name="ann-build", daemon=True).start()
+
+    def refresh(self, generation=None):
+        with self._lock:
+            if self._model is not None:
+                self._load(self._model, self._matrix.shape[1])
+
+    def search(self, query: np.ndarray, k: int, model: str) -> List[Tuple[str, float]]:
+        with self._lock:
+            if self._model != model:
+                self._load(model, len(query))
+            matrix, ids, ann = self._matrix, self._ids, self._ann
+        if not len(ids):
+            return []
+
+        # Over-fetch a little to make up for superseded rows
+        want = min(len(ids), k + 16)
+        if ann is not None:
+            labels, distances = ann.knn_query(query, k=want)
+            rows, scores = labels[0], 1.0 - distances[0]
+        else:
+            all_scores = matrix @ query
+            rows = np.argpartition(-all_scores, want - 1)[:want]
+            rows = rows[np.argsort(-all_scores[rows])]
+            scores = all_scores[rows]
+        hits = [(ids[r], float(s)) for r, s in zip(rows, scores) if ids[r] is not None]
+        return hits[:k]
+
+
+class PgVectorStore:
+    """
+    Embeddings in a Postgres table searched with pgvector's cosine distance;
+    an HNSW index on the column provides the ANN search.
+    A full rebuild writes to a staging table (suffix "_staging"), indexed once
+    loaded, which swap_in() renames over the live table in one transaction.
+    """
+
+    def __init__(self, suffix: str = ""):
+        self.suffix = suffix
+        self._tables = {}
+
+    def _name(self, model: str) -> str:
+        return "question_embeddings_" + re.sub(r"\W", "_", model) + self.suffix
+
+    def _table(self, model: str, dim: int):
+        if model not in self._tables:
+            from sqlalchemy import Table, Column, String, MetaData, text
+            from pgvector.sqlalchemy import Vector
+            from app.db.session import get_engine
+
+            engine = get_engine()
+            if engine.dialect.name != "postgresql":
+                raise RuntimeError("VECTOR_BACKEND=pgvector needs Postgres")
+            name = self._name(model)
+            table = Table(name, MetaData(), Column("id", String, primary_key=True), Column("embedding", Vector(dim)),
+                          Column("content_hash", String))
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+                table.create(conn, checkfirst=True)
+                # Tables created before content hashes were recorded
+                conn.execute(text(f"ALTER TABLE {name} ADD COLUMN IF NOT EXISTS content_hash VARCHAR"))
+                if not self.suffix:
+                    # Staging tables are bulk loaded first and indexed in swap_in
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_hnsw ON {name} USING hnsw (embedding vector_cosine_ops)"))
+            self._tables[model] = (engine, table)
+        return self._tables[model]
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, model: str, hashes: Sequence[str] = None):
+        from sqlalchemy.dialects.postgresql import insert
+        engine, table = self._table(model, vectors.shape[1])
+        rows = [{"id": i, "embedding": v, "content_hash": h} for i, v, h in zip(ids, vectors, hashes or [None] * len(ids))]
+        stmt = insert(table)
+        with engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["id"], set_={"embedding": stmt.excluded.embedding, "content_hash": stmt.excluded.content_hash}), rows)
+
+    def stored(self, ids: Sequence[str], hashes: Sequence[str], model: str, dim: int) -> Dict[str, np.ndarray]:
+        """
+        id -> stored vector for the ids whose row has the given content hash.
+        """
+        from sqlalchemy import select
+        engine, table = self._table(model, dim)
+        wanted = dict(zip(ids, hashes))
+        with engine.connect() as conn:
+            rows = conn.execute(select(table.c.id, table.c.content_hash, table.c.embedding).where(table.c.id.in_(list(wanted))))
+            return {doc_id: np.asarray(v, dtype=np.float32) for doc_id, digest, v in rows if digest and wanted[doc_id] == digest}
+
+    def reset(self, model: str):
+        engine, table = self._table(model, get_embedder().dim)
+        with engine.begin() as conn:
+            conn.execute(table.delete())
+
+    def drop(self, model: str):
+        """
+        Drops the table, e.g. a staging table left by an interrupted rebuild.
+        """
+        from sqlalchemy import text
+        from app.db.session import get_engine
+
+        with get_engine().begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._name(model)}"))
+        self._tables.pop(model, None)
+
+    def build_index(self, model: str):
+        """
+        Builds the HNSW index of a staging table (a no-op once built).
+        """
+        from sqlalchemy import text
+
+        engine, table = self._table(model, get_embedder().dim)
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table.name}_hnsw ON {table.name} USING hnsw (embedding vector_cosine_ops)"))
+
+    def swap_in(self, staged: "PgVectorStore", model: str):
+        """
+        Replaces this store's table with staged's: the HNSW index is built on the
+        staging table first, then drop and renames happen in one transaction, so
+        searches see the old vectors until the new ones are complete.
+        """
+        from sqlalchemy import text
+
+        engine, table = staged._table(model, get_embedder().dim)
+        staging, live = table.name, self._name(model)
+        staged.build_index(model)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {live}"))
+            conn.execute(text(f"ALTER TABLE {staging} RENAME TO {live}"))
+            # Keep the names a later staging table will want free
+            conn.execute(text(f"ALTER TABLE {live} RENAME CONSTRAINT {staging}_pkey TO {live}_pkey"))
+            conn.execute(text(f"ALTER INDEX {staging}_hnsw RENAME TO {live}_hnsw"))
+        staged._tables.pop(model, None)
+        self._tables.pop(model, None)
+
+    def refresh(self, generation=None):
+        pass
+
+    def search(self, query: np.ndarray, k: int, model: str) -> List[Tuple[str, float]]:
+        from sqlalchemy import select
+        engine, table = self._table(model, len(query))
+        distance = table.c.embedding.cosine_distance(query)
+        with engine.connect() as conn:
+            rows = conn.execute(select(table.c.id, distance).order_by(distance).limit(k))
+            return [(doc_id, 1.0 - float(d)) for doc_id, d in rows]
+
+
+vector_store = PgVectorStore() if VECTOR_BACKEND == "pgvector" else NumpyVectorStore()
+# Vectors are written just before each index commit, so a new generation means new rows to read
+index_manager.add_refresh_listener(vector_store.refresh)
+
+
+def _document_text(doc: dict) -> str:
+    return doc.get("content") or ""
+
+
+def content_hash(doc: dict) -> str:
+    return hashlib.blake2b(_document_text(doc).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def stored_vectors(documents: Sequence[dict]) -> Dict[str, np.ndarray]:
+    """
+    id -> live vector for the documents whose text has not changed since it was embedded,
+    so a rebuild only embeds new or edited questions. Empty if the store cannot be read.
+    """
+    documents = [d for d in documents if _document_text(d)]
+    if not documents:
+        return {}
+    embedder = get_embedder()
+    try:
+        return vector_store.stored([str(d["id"]) for d in documents], [content_hash(d) for d in documents],
+                                   embedder.name, embedder.dim)
+    except Exception as e:
+        print(f"Reading stored vectors failed: {e}")
+        return {}
+
+
+def index_documents(documents: Sequence[dict], store=None, vectors: np.ndarray = None,
+                    reused: Optional[Dict[str, np.ndarray]] = None):
+    """
+    Embeds a batch of documents and adds them to the vector store.
+    reused: id -> vector already computed for some of the documents (see stored_vectors).
+    vectors: embeddings already computed for the other documents that have text, in order.
+    Failures are reported, not raised: keyword search must not depend on embeddings.
+    """
+    documents = [d for d in documents if _document_text(d)]
+    if not documents:
+        return
+    reused = reused or {}
+    try:
+        todo = [d for d in documents if str(d["id"]) not in reused]
+        if vectors is None and todo:
+            vectors = embed_documents([_document_text(d) for d in todo])
+        fresh = iter(vectors if todo else ())
+        vectors = np.stack([reused[str(d["id"])] if str(d["id"]) in reused else next(fresh) for d in documents])
+        (store or vector_store).add([str(d["id"]) for d in documents], vectors, get_embedder().name,
+                                    hashes=[content_hash(d) for d in documents])
+    except Exception as e:
+        print(f"Embedding failed for {len(documents)} documents: {e}")
+
+
+def embed_batch(documents: Sequence[dict]):
+    """
+    Embeddings for the documents with text, or None on failure; safe to run in a worker process.
+    """
+    texts = [_document_text(d) for d in documents if _document_text(d)]
+    if not texts:
+        return None
+    try:
+        return embed_documents(texts)
+    except Exception as e:
+        print(f"Embedding failed for {len(texts)} documents: {e}")
+        return None
+
+
+def reset():
+    vector_store.reset(get_embedder().name)
+
+
+def staging_store(staging_dir: str):
+    """
+    Empty store for a full rebuild, built beside the live one and swapped in by
+    publish(): a numpy store in staging_dir, or a pgvector staging table.
+    """
+    model = get_embedder().name
+    if isinstance(vector_store, NumpyVectorStore):
+        store = NumpyVectorStore(staging_dir)
+        store.reset(model)
+    else:
+        store = PgVectorStore(suffix="_staging")
+        store.drop(model)
+    return store
+
+
+def prepare(store):
+    """
+    Does the slow part of publish() ahead of time: a pgvector staging table gets its
+    HNSW index, so publish() only renames while the index write lock is held.
+    """
+    if isinstance(store, PgVectorStore) and store is not vector_store:
+        store.build_index(get_embedder().name)
+
+
+def publish(store):
+    """
+    Makes a staged store live. Numpy files are moved over the live ones, vectors
+    first, then ids, so a reader that notices the new ids file reloads against the
+    new vectors; a pgvector staging table is renamed over the live table.
+    """
+    if store is vector_store:
+        return
+    model = get_embedder().name
+    if isinstance(store, PgVectorStore):
+        vector_store.swap_in(store, model)
+        return
+    os.makedirs(vector_store.vector_dir, exist_ok=True)
+    for staged, live in zip(store._paths(model), vector_store._paths(model)):
+        if os.path.exists(staged):
+            os.replace(staged, live)
+        elif os.path.exists(live):
+            os.remove(live)
+
+
+def search(query_str: str, k: int = 50) -> List[Tuple[str, float]]:
+    """
+    (id, cosine similarity) of the k documents nearest to the query.
+    """
+    return vector_store.search(embed_query(query_str), k, get_embedder().name)
@@ -0,0 +1,480 @@
+"""
+Search and ingest benchmarks on a seeded synthetic corpus (see corpus.py).
+
+Builds an index of --docs synthetic questions in --workdir (or reuses one built
+with the same --docs and --seed), then runs the selected sections:
+
+- build:      full rebuild throughput through replace_all_documents
+- cold:       latency of the first queries in fresh processes (index open, spell table, facets)
+- warm:       in-process latency over a repeated query mix
+- fuzzy:      clean vs misspelled (spell-corrected) vs explicit term~1 fuzzy queries
+- suggest:    typeahead completion latency for every prefix of the queries
+- concurrent: requests/s and latency against the API under uvicorn, per client count
+- ingest:     add_documents throughput, in batches, on top of the built index
+- pdf:        parse throughput of the PDFs in uploaded_pdfs/
+
+Latencies are reported in milliseconds as p50/p95/p99. The report is JSON, printed
+and optionally written to --output; --baseline prints the change in every number
+against an earlier report.
+
+    python benchmarks/bench_search.py --docs 100000 --output bench-100k.json
+    python benchmarks/bench_search.py --docs 100000 --workdir /tmp/bench-100k --only warm,fuzzy --baseline bench-100k.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+from urllib.parse import urlencode
+
+BACKEND_DIR = Path(__file__).parent.parent.resolve()
+PDF_DIR = BACKEND_DIR / "uploaded_pdfs"
+sys.path.append(str(BACKEND_DIR))
+sys.path.append(str(Path(__file__).parent))
+
+from corpus import CorpusGenerator, misspell
+
+SECTIONS = ["build", "cold", "warm", "fuzzy", "suggest", "concurrent", "ingest", "pdf"]
+# Identifies the corpus an existing workdir was built from
+CORPUS_MARKER = "bench_corpus.json"
+
+COLD_PROBE = """
+import sys, json, time
+sys.path.append({backend!r})
+queries = json.loads(sys.stdin.read())
+start = time.perf_counter()
+from app.services.search_engine import search_page
+imported = time.perf_counter()
+samples = []
+for q in queries:
+    t = time.perf_counter()
+    search_page(q)
+    samples.append((time.perf_counter() - t) * 1000)
+print(json.dumps({{"import_ms": (imported - start) * 1000, "samples_ms": samples}}))
+"""
+
+
+def percentiles(samples_ms) -> dict:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"count": 0}
+
+    def at(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": at(50),
+        "p95": at(95),
+        "p99": at(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def bench_build(generator: CorpusGenerator, docs: int, procs: int) -> dict:
+    from app.services.search_engine import replace_all_documents, index_manager
+
+    start = time.perf_counter()
+    read = replace_all_documents(lambda: generator.documents(docs), procs=procs)
+    seconds = time.perf_counter() - start
+    with index_manager.searcher() as searcher:
+        indexed = searcher.doc_count()
+    return {
+        "documents_read": read,
+        "documents_indexed": indexed,
+        "merged_duplicates": read - indexed,
+        "procs": procs,
+        "seconds": round(seconds, 2),
+        "docs_per_second": round(read / seconds, 1),
+    }
+
+
+def bench_cold(queries, runs: int, per_run: int) -> dict:
+    """
+    Each run is a fresh interpreter: the first query pays for opening the index,
+    building the spell-correction table and loading facet columns.
+    """
+    first, rest, imports = [], [], []
+    for run in range(runs):
+        batch = queries[run * per_run:(run + 1) * per_run]
+        out = subprocess.run(
+            [sys.executable, "-c", COLD_PROBE.format(backend=str(BACKEND_DIR))],
+            input=json.dumps(batch), env=_env(), capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(probe["import_ms"])
+        first.append(probe["samples_ms"][0])
+        rest.extend(probe["samples_ms"][1:])
+    return {
+        "runs": runs,
+        "import_ms": percentiles(imports),
+        "first_query_ms": percentiles(first),
+        "following_queries_ms": percentiles(rest),
+    }
+
+
+def bench_warm(queries, rounds: int) -> dict:
+    from app.services.search_engine import search_page
+
+    for q in queries:
+        search_page(q)
+    samples = [_timed(search_page, q) for _ in range(rounds) for q in queries]
+    hybrid = [_timed(search_page, q, mode="hybrid") for q in queries]
+    filtered = [_timed(search_page, q, filters={"subject": "Physics"}) for q in queries]
+    deep = [_timed(search_page, q, page=5) for q in queries]
+    return {
+        "distinct_queries": len(queries),
+        "bm25_ms": percentiles(samples),
+        "hybrid_ms": percentiles(hybrid),
+        "subject_filter_ms": percentiles(filtered),
+        "page_5_ms": percentiles(deep),
+    }
+
+
+def bench_fuzzy(queries, seed: int) -> dict:
+    """
+    Cost of typo handling: misspelled queries go through spell correction before
+    the search; explicit term~1 queries expand fuzzy terms inside Whoosh.
+    """
+    from app.services.search_engine import search_page, spell_corrector
+
+    rng = random.Random(seed)
+    typos = [misspell(q, rng) for q in queries]
+    fuzzy = [" ".join(f"{w}~1" if len(w) >= 4 else w for w in q.split()) for q in typos]
+    for q in queries + typos:
+        search_page(q)
+
+    corrected = sum(spell_corrector.correct_query(t) == q for t, q in zip(typos, queries) if t != q)
+    misspelled = sum(t != q for t, q in zip(typos, queries))
+    return {
+        "queries": len(queries),
+        "clean_ms": percentiles([_timed(search_page, q) for q in queries]),
+        "misspelled_ms": percentiles([_timed(search_page, q) for q in typos]),
+        "correction_only_ms": percentiles([_timed(spell_corrector.correct_query, q) for q in typos]),
+        "explicit_fuzzy_ms": percentiles([_timed(search_page, q) for q in fuzzy]),
+        "corrected_to_original": round(corrected / max(misspelled, 1), 3),
+    }
+
+
+def bench_suggest(queries) -> dict:
+    from app.services.suggest import suggest_index
+
+    start = time.perf_counter()
+    suggest_index.rebuild()
+    build_seconds = time.perf_counter() - start
+    # What the search box sends while each query is typed
+    prefixes = [q[:i] for q in queries for i in range(1, len(q) + 1) if not q[i - 1].isspace()]
+    return {
+        "build_seconds": round(build_seconds, 3),
+        "words": len(suggest_index._state[0]),
+        "prefixes": len(prefixes),
+        "latency_ms": percentiles([_timed(suggest_index.suggest, p) for p in prefixes]),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(port: int, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"API did not start on port {port} within {timeout}s")
+
+
+class _QueryStream:
+    """
+    Hands out distinct queries to the client threads, wrapping around only when all are used.
+    """
+
+    def __init__(self, queries):
+        self.queries = list(dict.fromkeys(queries))
+        self.position = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            query = self.queries[self.position % len(self.queries)]
+            self.position += 1
+            return query
+
+
+def _client(port: int, queries: _QueryStream, deadline: float, samples: list, errors: list):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.monotonic() < deadline:
+        path = "/api/v1/search?" + urlencode({"q": queries.next()})
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors.append(resp.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+    conn.close()
+
+
+def bench_concurrent(queries, client_counts, duration: float, workers: int) -> dict:
+    """
+    Clients are threads with keep-alive connections issuing searches back to back.
+    Every request uses a query not sent before, as long as the query list lasts, so
+    the result cache does not hide the search cost; its hit rate is reported.
+    """
+    stream = _QueryStream(queries)
+    port = _free_port()
+    env = _env()
+    env["SEARCH_ONLY"] = "true"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    levels = {}
+    try:
+        _wait_for(port)
+        for clients in client_counts:
+            samples, errors = [], []
+            deadline = time.monotonic() + duration
+            threads = [
+                threading.Thread(target=_client, args=(port, stream, deadline, samples, errors))
+                for _ in range(clients)
+            ]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            levels[str(clients)] = {
+                "requests": len(samples),
+                "errors": len(errors),
+                "requests_per_second": round(len(samples) / elapsed, 1),
+                "latency_ms": percentiles(samples),
+            }
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", "/api/v1/search/cache")
+        cache = json.loads(conn.getresponse().read())
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "server_workers": workers,
+        "seconds_per_level": duration,
+        "distinct_queries": len(stream.queries),
+        "clients": levels,
+        "result_cache": cache,
+    }
+
+
+def bench_ingest(generator: CorpusGenerator, docs: int, batch_size: int) -> dict:
+    """
+    New questions (a separate corpus stream) added through add_documents, one commit per batch.
+    """
+    from app.services.search_engine import add_documents
+
+    documents = list(generator.documents(docs, stream=1))
+    samples = []
+    start = time.perf_counter()
+    for i in range(0, len(documents), batch_size):
+        samples.append(_timed(add_documents, documents[i:i + batch_size]))
+    seconds = time.perf_counter() - start
+    return {
+        "documents": len(documents),
+        "batch_size": batch_size,
+        "seconds": round(seconds, 2),
+        "docs_per_second": round(len(documents) / seconds, 1),
+        "batch_ms": percentiles(samples),
+    }
+
+
+def bench_pdf(pdf_dir: Path, repeats: int, tag: bool) -> dict:
+    import PyPDF2
+    from app.services.pdf_parser import iter_page_texts, iter_questions, tag_questions
+
+    pdfs = sorted(pdf_dir.glob("*.pdf"))
+    if not pdfs:
+        return {"error": f"no PDFs in {pdf_dir}"}
+    pages = questions = size = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for pdf in pdfs:
+            size += pdf.stat().st_size
+            with open(pdf, "rb") as f:
+                reader = PyPDF2.PdfReader(f)
+                parsed = list(iter_questions(iter_page_texts(reader)))
+                pages += len(reader.pages)
+            if tag:
+                tag_questions(parsed)
+            questions += len(parsed)
+    seconds = time.perf_counter() - start
+    return {
+        "files": len(pdfs) * repeats,
+        "pages": pages,
+        "questions": questions,
+        "tagged": tag,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 1),
+        "questions_per_second": round(questions / seconds, 1),
+        "mb_per_second": round(size / 1e6 / seconds, 2),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, path: str = "") -> dict:
+    """
+    Relative change (new / old - 1) of every number present in both reports.
+    """
+    changes = {}
+    for key, value in report.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict) and isinstance(old, dict):
+            changes.update(compare(value, old, name))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and not isinstance(value, bool) and old:
+            changes[name] = round(value / old - 1, 3)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10000, help="synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="where the index lives; reused if it holds the same corpus (default: a temp dir)")
+    parser.add_argument("--only", default=",".join(SECTIONS), help="comma-separated sections to run")
+    parser.add_argument("--queries", type=int, default=200, help="distinct queries per section")
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 1, help="processes for the index build")
+    parser.add_argument("--warm-rounds", type=int, default=5)
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--cold-queries", type=int, default=20, help="queries timed per cold run")
+    parser.add_argument("--clients", default="1,4,16", help="concurrent client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per client count")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrent-queries", type=int, default=50000, help="query pool for the concurrent section")
+    parser.add_argument("--ingest-docs", type=int, default=2000)
+    parser.add_argument("--ingest-batch", type=int, default=200)
+    parser.add_argument("--pdf-dir", type=Path, default=PDF_DIR)
+    parser.add_argument("--pdf-repeats", type=int, default=3)
+    parser.add_argument("--pdf-tag", action="store_true", help="include spaCy tagging in the PDF timing")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    sections = [s for s in args.only.split(",") if s]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    # Everything the app keeps on disk (indexdir, vectordir, the SQLite fallback) is relative to the cwd
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="pyq-bench-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    # Benchmarks must not call the Gemini embedding API, and run without Postgres unless one is configured
+    os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+    os.environ.setdefault("DB_SQLITE_FALLBACK", "true")
+
+    generator = CorpusGenerator(seed=args.seed)
+    queries = generator.queries(max(args.queries, args.cold_runs * args.cold_queries))
+    corpus = {"docs": args.docs, "seed": args.seed}
+    marker = workdir / CORPUS_MARKER
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workdir": str(workdir),
+            "corpus": corpus,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+    }
+
+    needs_index = any(s in sections for s in ("cold", "warm", "fuzzy", "suggest", "concurrent", "ingest"))
+    built = marker.exists() and json.loads(marker.read_text()) == corpus
+    if "build" in sections or (needs_index and not built):
+        print(f"Building an index of {args.docs} synthetic questions in {workdir}...", file=sys.stderr)
+        marker.unlink(missing_ok=True)
+        report["build"] = bench_build(generator, args.docs, args.procs)
+        marker.write_text(json.dumps(corpus))
+
+    for section in sections:
+        if section == "build":
+            continue
+        print(f"Running {section}...", file=sys.stderr)
+        if section == "cold":
+            report["cold"] = bench_cold(queries, args.cold_runs, args.cold_queries)
+        elif section == "warm":
+            report["warm"] = bench_warm(queries[:args.queries], args.warm_rounds)
+        elif section == "fuzzy":
+            report["fuzzy"] = bench_fuzzy(queries[:args.queries], args.seed)
+        elif section == "suggest":
+            report["suggest"] = bench_suggest(queries[:args.queries])
+        elif section == "concurrent":
+            clients = [int(c) for c in args.clients.split(",") if c]
+            report["concurrent"] = bench_concurrent(generator.queries(args.concurrent_queries, seed_offset=2),
+                                                    clients, args.duration, args.workers)
+        elif section == "ingest":
+            report["ingest"] = bench_ingest(generator, args.ingest_docs, args.ingest_batch)
+            # The index no longer matches the marker once documents are added
+            marker.unlink(missing_ok=True)
+        elif section == "pdf":
+            report["pdf"] = bench_pdf(args.pdf_dir, args.pdf_repeats, args.pdf_tag)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["change_vs_baseline"] = compare({k: v for k, v in report.items() if k != "meta"}, baseline)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
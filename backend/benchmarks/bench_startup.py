@@ -0,0 +1,96 @@
+"""
+Cold-start cost of the API process.
+
+Reports, for the full API and for a read-only search replica (SEARCH_ONLY=true):
+- import time of app.main (median of fresh interpreters) and which heavy modules it pulled in
+- time from spawning uvicorn to the first successful /api/v1/search response
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+HEAVY_MODULES = ["spacy", "PyPDF2", "google.genai", "sqlmodel"]
+
+IMPORT_PROBE = f"""
+import sys, time, json
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _env(search_only: bool) -> dict:
+    env = dict(os.environ)
+    env["SEARCH_ONLY"] = "true" if search_only else "false"
+    return env
+
+
+def measure_import(search_only: bool, runs: int) -> dict:
+    samples, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE],
+            cwd=BACKEND_DIR, env=_env(search_only), capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        loaded = probe["loaded"]
+    return {"import_seconds": round(statistics.median(samples), 3), "heavy_modules_loaded": loaded}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_response(search_only: bool, timeout: float = 60.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/v1/search?q=carnot"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(search_only), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return round(time.perf_counter() - start, 3)
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from {url} within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for mode, search_only in (("full", False), ("search_only", True)):
+        result = measure_import(search_only, args.runs)
+        result["first_response_seconds"] = statistics.median(
+            measure_first_response(search_only) for _ in range(args.runs)
+        )
+        report[mode] = result
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Questions-per-second for spaCy tagging at ingest time.
+
+before: one nlp() call per question on the full pipeline (the old parse loop)
+after:  tag_questions-style nlp.pipe over NER only
+
+    python benchmarks/bench_tagging.py --count 2000 --batch-size 64 --n-process 1
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import spacy
+import PyPDF2
+from app.services.pdf_parser import _ner_only, iter_page_texts, iter_questions, TAG_LABELS
+
+PDF_DIR = Path(__file__).parent.parent / "uploaded_pdfs"
+
+
+def load_snippets(count: int) -> list:
+    """
+    Question snippets from the uploaded PDFs, repeated up to count.
+    """
+    texts = []
+    for pdf in sorted(PDF_DIR.glob("*.pdf")):
+        with open(pdf, "rb") as f:
+            texts += [q.text[:200] for q in iter_questions(iter_page_texts(PyPDF2.PdfReader(f)))]
+    if not texts:
+        texts = ["A Carnot engine works between temperatures 727°C and 27°C. The efficiency of the heat engine is:"]
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def bench_before(nlp, snippets) -> float:
+    start = time.perf_counter()
+    for text in snippets:
+        doc = nlp(text)
+        [ent.text for ent in doc.ents if ent.label_ in TAG_LABELS]
+    return len(snippets) / (time.perf_counter() - start)
+
+
+def bench_after(nlp, snippets, batch_size: int, n_process: int) -> float:
+    start = time.perf_counter()
+    for doc in nlp.pipe(snippets, batch_size=batch_size, n_process=n_process):
+        [ent.text for ent in doc.ents if ent.label_ in TAG_LABELS]
+    return len(snippets) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="en_core_web_sm", help="spaCy package name or model path")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    snippets = load_snippets(args.count)
+    full = spacy.load(args.model)
+    ner_only = _ner_only(spacy.load(args.model))
+
+    # Warm up both pipelines before timing
+    bench_before(full, snippets[:50])
+    bench_after(ner_only, snippets[:50], args.batch_size, 1)
+
+    result = {
+        "model": args.model,
+        "questions": len(snippets),
+        "batch_size": args.batch_size,
+        "n_process": args.n_process,
+        "full_pipeline": full.pipe_names,
+        "tagging_pipeline": ner_only.pipe_names,
+        "before_qps": round(bench_before(full, snippets), 1),
+        "after_qps": round(bench_after(ner_only, snippets, args.batch_size, args.n_process), 1),
+    }
+    result["speedup"] = round(result["after_qps"] / result["before_qps"], 2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Seeded synthetic question corpus for benchmarks.
+
+Exam, subject, year and question type are drawn from their joint distribution in
+metadata.jsonl. Question text mixes subject terms with a Zipf-distributed
+vocabulary of pseudo-words, so posting-list lengths look like natural text at any
+corpus size. A small share of questions are reworded copies of earlier ones, so
+near-duplicate merging runs as it would on real papers.
+The same (count, seed) always yields the same documents, in the same order.
+
+    python benchmarks/corpus.py --count 100000 --seed 7 > corpus.jsonl
+"""
+import sys
+import json
+import random
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Iterator, List
+import numpy as np
+
+METADATA_PATH = Path(__file__).parent.parent / "metadata.jsonl"
+
+VOCAB_SIZE = 50000
+ZIPF_EXPONENT = 1.07
+# Share of question words drawn from the subject's own terms
+SUBJECT_TERM_SHARE = 0.2
+DUPLICATE_RATE = 0.02
+QUESTIONS_PER_PAPER = 180
+
+SUBJECT_TERMS = {
+    "Physics": "velocity acceleration momentum torque friction pendulum inertia projectile gravitation "
+               "oscillation wavelength frequency refraction diffraction interference capacitor resistor "
+               "inductance magnetic electric potential current voltage thermodynamics entropy carnot "
+               "photoelectric nucleus isotope semiconductor transistor",
+    "Chemistry": "molarity molality equilibrium enthalpy entropy oxidation reduction electrolysis catalyst "
+                 "isomer alkane alkene alkyne benzene aldehyde ketone ester amine polymer hybridization "
+                 "orbital electronegativity ionization lanthanide coordination ligand titration buffer "
+                 "solubility kinetics",
+    "Biology": "mitochondria chloroplast ribosome enzyme glycolysis photosynthesis respiration mitosis "
+               "meiosis chromosome allele genotype phenotype mutation transcription translation hormone "
+               "neuron nephron antibody antigen ecosystem population pollination fertilization embryo "
+               "evolution taxonomy",
+    "Botany": "xylem phloem stomata transpiration auxin gibberellin cytokinin photoperiodism pollination "
+              "germination meristem cambium angiosperm gymnosperm bryophyte pteridophyte inflorescence "
+              "placentation chlorophyll rubisco nitrogen rhizobium mycorrhiza",
+    "Zoology": "nephron neuron synapse hormone insulin thyroxine haemoglobin antibody lymphocyte "
+               "spermatogenesis oogenesis placenta embryo gastrulation notochord vertebrate arthropod "
+               "annelid mollusca echinoderm chordata cardiac ventricle alveoli",
+    "Math": "integral derivative limit continuity matrix determinant vector probability permutation "
+            "combination parabola ellipse hyperbola logarithm polynomial sequence series binomial "
+            "trigonometric differential equation complex eigenvalue function tangent normal",
+}
+
+_CONSONANTS = "bcdfghklmnprstvz"
+_VOWELS = "aeiou"
+
+
+def load_distribution(path: Path = METADATA_PATH) -> Counter:
+    """
+    Counts of (exam_name, subject, exam_year, question_type) in the metadata file.
+    """
+    counts = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            counts[(item.get("exam_name", "NEET"), item.get("subject", "Unknown"),
+                    str(item.get("exam_year", "Unknown")), item.get("question_type", "MCQ_SINGLE_CORRECT"))] += 1
+    return counts
+
+
+def pseudo_words(count: int, seed: int) -> List[str]:
+    """
+    count distinct pronounceable words of 2-4 syllables, at least 4 letters long.
+    """
+    rng = random.Random(seed)
+    words, seen = [], set()
+    while len(words) < count:
+        word = "".join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class CorpusGenerator:
+    """
+    Deterministic documents and queries for one seed.
+    """
+
+    def __init__(self, seed: int = 0, vocab_size: int = VOCAB_SIZE, duplicate_rate: float = DUPLICATE_RATE,
+                 metadata_path: Path = METADATA_PATH):
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        self.vocab = pseudo_words(vocab_size, seed)
+        self._vocab_array = np.array(self.vocab, dtype=object)
+        weights = np.arange(1, vocab_size + 1, dtype=np.float64) ** -ZIPF_EXPONENT
+        self.word_cdf = np.cumsum(weights / weights.sum())
+
+        distribution = load_distribution(metadata_path)
+        self.strata = list(distribution)
+        weights = np.array([distribution[s] for s in self.strata], dtype=np.float64)
+        self.strata_cdf = np.cumsum(weights / weights.sum())
+        self.subject_terms = {s: terms.split() for s, terms in SUBJECT_TERMS.items()}
+        # Subjects missing from SUBJECT_TERMS draw from all of them
+        self.any_terms = sorted({t for terms in self.subject_terms.values() for t in terms})
+
+    def _words(self, rng: np.random.RandomState, n: int) -> List[str]:
+        return self._vocab_array[np.searchsorted(self.word_cdf, rng.random_sample(n))].tolist()
+
+    def _sentence(self, rng: np.random.RandomState, subject: str, n: int) -> str:
+        words = self._words(rng, n)
+        terms = self.subject_terms.get(subject, self.any_terms)
+        positions = np.flatnonzero(rng.random_sample(n) < SUBJECT_TERM_SHARE)
+        for position, pick in zip(positions, rng.randint(len(terms), size=len(positions))):
+            words[position] = terms[pick]
+        return " ".join(words)
+
+    def documents(self, count: int, stream: int = 0) -> Iterator[dict]:
+        """
+        count index documents, shaped like ingest_manual.build_document output.
+        Each stream is an independent sequence over the same vocabulary, e.g. stream 1
+        for questions added on top of an index built from stream 0.
+        """
+        rng = np.random.RandomState([self.seed, stream])
+        strata = np.searchsorted(self.strata_cdf, rng.random_sample(count))
+        recent = []  # (content, options, subject) of earlier questions, for near-duplicates
+        for i in range(count):
+            exam, subject, year, qtype = self.strata[strata[i]]
+            if recent and rng.random_sample() < self.duplicate_rate:
+                # Same question reprinted in another paper, with one word changed
+                content, options, subject = recent[rng.randint(len(recent))]
+                words = content.split(" ")
+                words[rng.randint(len(words))] = self._words(rng, 1)[0]
+                content = " ".join(words)
+            else:
+                length = max(8, int(rng.normal(40, 15)))
+                content = self._sentence(rng, subject, length) + "?"
+                options = [] if qtype == "INTEGER" else [self._sentence(rng, subject, rng.randint(1, 5)) for _ in range(4)]
+            if len(recent) < 1000:
+                recent.append((content, options, subject))
+            else:
+                recent[rng.randint(len(recent))] = (content, options, subject)
+
+            answer = str(rng.randint(1, 5)) if options else str(rng.randint(0, 1000))
+            full_content = f"{content}\nOptions: {', '.join(options)}" if options else content
+            yield {
+                "id": f"syn_{self.seed}_{stream}_{i:08d}",
+                "content": full_content,
+                "tags": f"{subject},{year}",
+                "year": year,
+                "subject": subject,
+                "options": options,
+                "correct_answer": [answer],
+                "explanation": self._sentence(rng, subject, int(rng.randint(30, 120))),
+                "source": f"{exam}_{year}_P{i // QUESTIONS_PER_PAPER:05d}",
+            }
+
+    def queries(self, count: int, seed_offset: int = 1) -> List[str]:
+        """
+        1-3 word queries: a subject term plus mid-frequency vocabulary, like a
+        student's topic search. Words come from the same Zipf distribution as the
+        corpus, skipping the very commonest so most queries are selective.
+        """
+        rng = np.random.RandomState([self.seed, 1000 + seed_offset])
+        subjects = list(self.subject_terms)
+        queries = []
+        for _ in range(count):
+            terms = self.subject_terms[subjects[rng.randint(len(subjects))]]
+            words = [terms[rng.randint(len(terms))]]
+            for _ in range(rng.randint(0, 3)):
+                words.append(self.vocab[min(len(self.vocab) - 1, 20 + int(np.searchsorted(self.word_cdf, rng.random_sample())))])
+            queries.append(" ".join(words))
+        return queries
+
+
+def misspell(query: str, rng: random.Random) -> str:
+    """
+    The query with one edit (substitution, deletion, insertion or transposition) in
+    each word long enough for the spell corrector to consider.
+    """
+    words = []
+    for word in query.split():
+        if len(word) >= 5:
+            i = rng.randrange(1, len(word) - 1)
+            edit = rng.randrange(4)
+            if edit == 0:
+                word = word[:i] + rng.choice(_VOWELS + _CONSONANTS) + word[i + 1:]
+            elif edit == 1:
+                word = word[:i] + word[i + 1:]
+            elif edit == 2:
+                word = word[:i] + rng.choice(_VOWELS + _CONSONANTS) + word[i:]
+            else:
+                word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        words.append(word)
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicate-rate", type=float, default=DUPLICATE_RATE)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed, duplicate_rate=args.duplicate_rate)
+    for doc in generator.documents(args.count):
+        sys.stdout.write(json.dumps(doc) + "\n")
+
+
+if __name__ == "__main__":
+    main()
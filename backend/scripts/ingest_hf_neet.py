@@ -1,6 +1,7 @@
 
 import sys
 import os
+import asyncio
 from pathlib import Path
 
 # Add backend directory to path to import app modules
@@ -9,9 +10,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 from datasets import load_dataset
 from app.services.gemini_ocr import transcribe_image
 from app.services.search_engine import add_documents
+from app.services.question_store import upsert_questions
 import tqdm
 
-def ingest_dataset(limit=10):
+async def ingest_dataset(limit=10):
     print(f"Loading Reja1/jee-neet-benchmark (streaming)... limit={limit}")
     ds = load_dataset("Reja1/jee-neet-benchmark", split="test", streaming=True, trust_remote_code=True)
     
@@ -35,7 +37,7 @@ def ingest_dataset(limit=10):
             print(f"Processing {question_id}...")
             
             # OCR with Gemini
-            result = transcribe_image(image)
+            result = await transcribe_image(image)
             
             if result.get('error'):
                 print(f"Skipping {question_id}: {result['error']}")
@@ -61,7 +63,9 @@ def ingest_dataset(limit=10):
             count += 1
             
         print(f"Indexing {len(documents)} documents...")
-        add_documents(documents)
+        # Embedding and committing block; keep them off the event loop
+        await asyncio.to_thread(upsert_questions, documents)
+        await asyncio.to_thread(add_documents, documents)
         print("Done!")
         
     except Exception as e:
@@ -71,4 +75,4 @@ if __name__ == "__main__":
     qty = 5
     if len(sys.argv) > 1:
         qty = int(sys.argv[1])
-    ingest_dataset(limit=qty)
+    asyncio.run(ingest_dataset(limit=qty))
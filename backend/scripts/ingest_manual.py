@@ -1,8 +1,11 @@
 
 import sys
 import os
+import time
+import asyncio
+import argparse
 import json
-import requests
+import random
 from io import BytesIO
 from PIL import Image
 from pathlib import Path
@@ -10,124 +13,313 @@ from pathlib import Path
 # Add backend directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from app.services.gemini_ocr import transcribe_image
-from app.services.search_engine import add_documents, document_exists
+from app.services.gemini_ocr import transcribe_image, cached_transcription
+from app.services.search_engine import BulkIndexWriter, indexed_ids
+from app.services.image_cache import ImageCache, DATASET_SOURCE
+from app.services.question_store import upsert_questions
 
-BASE_URL = "https://huggingface.co/datasets/Reja1/jee-neet-benchmark/resolve/main"
+# Sentinel telling a stage's workers that the upstream stage is finished
+DONE = object()
 
-def download_metadata():
+def download_metadata(cache: ImageCache):
     if os.path.exists("metadata.jsonl"):
         print("Using cached metadata.jsonl")
         with open("metadata.jsonl", "r", encoding="utf-8") as f:
             return f.read().splitlines()
 
-    print("Downloading metadata.jsonl...")
-    url = f"{BASE_URL}/data/metadata.jsonl"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    
+    print(f"Fetching metadata.jsonl from {cache.source}...")
+    text = cache.fetch("data/metadata.jsonl").decode("utf-8")
+
     with open("metadata.jsonl", "w", encoding="utf-8") as f:
-        f.write(resp.text)
-        
-    return resp.text.splitlines()
+        f.write(text)
 
-import time
+    return text.splitlines()
 
-def ingest_manual(limit=10):
-    lines = download_metadata()
-    print(f"Found {len(lines)} items in metadata.")
-    
-    documents = []
-    processed_count = 0
-    
-    for line in lines:
-        if processed_count >= limit:
+
+class StageStats:
+    """
+    Items in/out and errors for one pipeline stage, for throughput reporting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.done = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def rate(self) -> float:
+        return self.done / max(time.monotonic() - self.started, 1e-9)
+
+    def __str__(self):
+        return f"{self.name}: {self.done} done, {self.errors} errors, {self.rate():.2f}/s"
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit: grows by roughly one slot per window of successful
+    calls and halves on a 429, at most once per cooldown so one burst of
+    rejections only counts once.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, cooldown: float = 5.0):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.cooldown = cooldown
+        self.active = 0
+        self.rate_limited = 0
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def release(self, rate_limited: bool = False):
+        async with self._changed:
+            self.active -= 1
+            now = time.monotonic()
+            if rate_limited:
+                self.rate_limited += 1
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._changed.notify_all()
+
+
+def build_document(item: dict, ocr_result: dict) -> dict:
+    question_id = item.get('question_id')
+    subject = item.get('subject', 'Unknown')
+    exam_year = item.get('exam_year', 'Unknown')
+
+    # Correct answer extraction from metadata (if available)
+    correct_answer_meta = item.get('correct_answer')
+
+    question_text = ocr_result.get('question_text', '')
+    options = ocr_result.get('options', [])
+    ocr_explanation = ocr_result.get('explanation', '')
+
+    full_content = f"{question_text}\nOptions: {', '.join(options)}"
+
+    return {
+        "id": str(question_id),
+        "content": full_content,
+        "tags": f"{subject},{exam_year}",
+        "year": str(exam_year),
+        "subject": subject,
+        "options": options,
+        "correct_answer": correct_answer_meta,
+        "explanation": ocr_explanation,
+        # Paper set, e.g. NEET_2024_T3, taken from images/<paper>/<file>.png
+        "source": Path(item.get('image_path') or item.get('file_name') or '').parent.name or item.get('exam_name')
+    }
+
+
+async def metadata_stage(lines, limit, out_q, stats, n_consumers):
+    """
+    Parses metadata and queues items that are not indexed yet, up to limit.
+    """
+    # One pass over the index and journal instead of a lookup per item
+    already_indexed = indexed_ids()
+    print(f"{len(already_indexed)} questions already indexed.")
+    queued = 0
+    for i, line in enumerate(lines):
+        if queued >= limit:
             break
-            
         try:
             item = json.loads(line)
-            question_id = item.get('question_id')
-            
+            item.setdefault('question_id', f"q_{i}")
+
             # Check if already indexed
-            if question_id and document_exists(str(question_id)):
-                # print(f"Skipping {question_id} (already indexed)")
+            if str(item['question_id']) in already_indexed:
                 continue
 
-            # Rate limiting pause (reduced since we handle errors inside OCR now)
-            time.sleep(2) 
-            
-            image_path = item.get('image_path') or item.get('file_name')
-            
-            # If image path not in item, maybe construct it?
-            # Based on inspection, let's assume item has 'image_path' matching the repo structure.
-            # If not, I'll print item keys to debug.
-            
-            if not image_path:
+            if not (item.get('image_path') or item.get('file_name')):
                 print(f"No image path for item: {item.keys()}")
+                stats.errors += 1
                 continue
-                
-            # Construct image URL
-            # image_path usually looks like 'images/...'
-            image_url = f"{BASE_URL}/{image_path}"
-            
-            # Download image
-            # print(f"Downloading image: {image_url}")
-            img_resp = requests.get(image_url)
-            if img_resp.status_code != 200:
-                print(f"Failed to download {image_url}")
-                continue
-                
-            image = Image.open(BytesIO(img_resp.content))
-            
-            question_id = item.get('question_id', f"q_{processed_count}")
-            subject = item.get('subject', 'Unknown')
-            exam_year = item.get('exam_year', 'Unknown')
-            
-            print(f"Processing {question_id} ({subject} {exam_year})...")
-            
-            # Gemini OCR
-            ocr_result = transcribe_image(image)
-            
-            if ocr_result.get('error'):
-                print(f"OCR Error: {ocr_result['error']}")
-                time.sleep(5) # Backoff a bit more on error
-                continue
-                
-            # Correct answer extraction from metadata (if available)
-            correct_answer_meta = item.get('correct_answer')
-            
-            question_text = ocr_result.get('question_text', '')
-            options = ocr_result.get('options', [])
-            ocr_explanation = ocr_result.get('explanation', '')
-            
-            full_content = f"{question_text}\nOptions: {', '.join(options)}"
-            
-            doc = {
-                "id": str(question_id),
-                "content": full_content,
-                "tags": f"{subject},{exam_year}",
-                "year": str(exam_year),
-                "subject": subject,
-                "options": options,
-                "correct_answer": correct_answer_meta,
-                "explanation": ocr_explanation
-            }
-            
-            # Add document immediately to index so we can resume if crash
-            add_documents([doc])
-            print(f"Indexed {question_id}")
-            processed_count += 1
-            
+
+            await out_q.put(item)
+            queued += 1
+            stats.done += 1
         except Exception as e:
-            print(f"Error processing item: {e}")
-            
+            print(f"Error reading metadata line: {e}")
+            stats.errors += 1
+
+    for _ in range(n_consumers):
+        await out_q.put(DONE)
+
+
+async def download_worker(in_q, out_q, stats, cache: ImageCache):
+    while (item := await in_q.get()) is not DONE:
+        # image_path usually looks like 'images/...'
+        image_path = item.get('image_path') or item.get('file_name')
+        try:
+            data = await asyncio.to_thread(cache.fetch, image_path)
+            image = Image.open(BytesIO(data))
+            await out_q.put((item, image))
+            stats.done += 1
+        except Exception as e:
+            print(f"Failed to download {image_path}: {e}")
+            stats.errors += 1
+
+
+async def transcribe(item, image, limiter: AdaptiveLimit, max_attempts: int) -> dict:
+    """
+    OCR result for one image: from the cache, or from Gemini with per-item backoff on 429s.
+    """
+    image_path = item.get('image_path') or item.get('file_name')
+    # Images OCR'd on an earlier run skip the limiter (and Gemini) entirely
+    ocr_result = await cached_transcription(image)
+    for attempt in range(0 if ocr_result else max_attempts):
+        await limiter.acquire()
+        rate_limited = False
+        try:
+            ocr_result = await transcribe_image(image, max_retries=1, image_path=image_path)
+            rate_limited = bool(ocr_result.get('rate_limited'))
+        finally:
+            # Always hand the slot back, or a failed call shrinks the pool for good
+            await limiter.release(rate_limited=rate_limited)
+        if not rate_limited:
+            break
+        # Back off this item only; the limiter has already cut concurrency for everyone
+        await asyncio.sleep(min(60, 2 ** attempt) + random.uniform(0, 1))
+    return ocr_result
+
+
+async def ocr_worker(in_q, out_q, stats, limiter: AdaptiveLimit, max_attempts: int):
+    while (work := await in_q.get()) is not DONE:
+        item, image = work
+        question_id = item['question_id']
+
+        # A failure on one item (bad image, missing API key) must not stop the worker,
+        # or the downloaders block forever on the full queue
+        try:
+            ocr_result = await transcribe(item, image, limiter, max_attempts)
+        except Exception as e:
+            print(f"OCR failed for {question_id}: {e}")
+            stats.errors += 1
+            continue
+
+        if ocr_result.get('error'):
+            print(f"OCR Error for {question_id}: {ocr_result['error']}")
+            stats.errors += 1
+            continue
+
+        print(f"Transcribed {question_id} ({item.get('subject', 'Unknown')} {item.get('exam_year', 'Unknown')})")
+        await out_q.put(build_document(item, ocr_result))
+        stats.done += 1
+
+
+async def index_stage(in_q, stats, batch_size: int, flush_interval: float):
+    """
+    Saves documents to the question table and indexes them through a BulkIndexWriter:
+    one commit per batch_size documents or flush_interval seconds, with committed
+    ids journaled for exact resume. Commits (and the embedding and database writes
+    before them) run in a thread so the other stages keep going meanwhile.
+    """
+    writer = BulkIndexWriter(batch_size=batch_size, flush_interval=flush_interval, on_flush=upsert_questions)
+    try:
+        while True:
+            try:
+                doc = await asyncio.wait_for(in_q.get(), timeout=flush_interval)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(writer.flush_if_due)
+                stats.done = writer.committed
+                continue
+            if doc is DONE:
+                break
+            await asyncio.to_thread(writer.add, doc)
+            stats.done = writer.committed
+    finally:
+        await asyncio.to_thread(writer.close)
+    stats.done = writer.committed
+
+
+async def report_progress(all_stats, limiter, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        print(" | ".join(str(s) for s in all_stats) + f" | OCR concurrency {limiter.limit:.1f}, 429s {limiter.rate_limited}")
+
+
+async def ingest_manual(limit=10, download_workers=4, ocr_workers=8, ocr_initial=2,
+                        queue_size=16, index_batch=200, flush_interval=30.0, max_attempts=6,
+                        source=DATASET_SOURCE, offline=False):
+    """
+    Staged pipeline: metadata -> download -> OCR -> index, with bounded queues
+    between stages. OCR concurrency adapts to the observed 429 rate (AIMD).
+    """
+    # Images are served from the local content-addressed cache after the first run
+    cache = ImageCache(source=source, offline=offline)
+    lines = download_metadata(cache)
+    print(f"Found {len(lines)} items in metadata.")
+
+    download_q = asyncio.Queue(maxsize=queue_size)
+    ocr_q = asyncio.Queue(maxsize=queue_size)
+    index_q = asyncio.Queue(maxsize=queue_size)
+
+    stats = [StageStats(n) for n in ("metadata", "download", "ocr", "index")]
+    meta_stats, download_stats, ocr_stats, index_stats = stats
+    limiter = AdaptiveLimit(initial=min(ocr_initial, ocr_workers), maximum=ocr_workers)
+    reporter = asyncio.create_task(report_progress(stats, limiter, interval=10))
+
+    indexer = asyncio.create_task(index_stage(index_q, index_stats, index_batch, flush_interval))
+    producer = asyncio.create_task(metadata_stage(lines, limit, download_q, meta_stats, download_workers))
+    downloaders = [asyncio.create_task(download_worker(download_q, ocr_q, download_stats, cache)) for _ in range(download_workers)]
+    ocr_tasks = [asyncio.create_task(ocr_worker(ocr_q, index_q, ocr_stats, limiter, max_attempts)) for _ in range(ocr_workers)]
+
+    async def drain():
+        await producer
+        await asyncio.gather(*downloaders)
+        for _ in ocr_tasks:
+            await ocr_q.put(DONE)
+        await asyncio.gather(*ocr_tasks)
+        await index_q.put(DONE)
+        await indexer
+
+    # If any stage dies the others would wait on its queue forever: stop them all and re-raise
+    tasks = [asyncio.create_task(drain()), indexer, producer, *downloaders, *ocr_tasks]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks + [reporter]:
+            task.cancel()
 
     print("Ingestion complete.")
+    for s in stats:
+        print(f"  {s}")
+    print(f"  image cache: {cache.hits} hits, {cache.misses} downloads")
+    print(f"  OCR concurrency ended at {limiter.limit:.1f} after {limiter.rate_limited} rate-limited calls")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR the JEE/NEET benchmark images with Gemini and index them.")
     # Default to a small batch but allow running larger batches
-    qty = 5
-    if len(sys.argv) > 1:
-        qty = int(sys.argv[1])
     # Pass a very large number if you want to index everything: `python ingest_manual.py 1000`
-    ingest_manual(limit=qty)
+    parser.add_argument("limit", nargs="?", type=int, default=5, help="number of new items to process")
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--ocr-workers", type=int, default=8, help="upper bound on concurrent OCR calls")
+    parser.add_argument("--ocr-initial", type=int, default=2, help="starting OCR concurrency")
+    parser.add_argument("--queue-size", type=int, default=16, help="bound on each inter-stage queue")
+    parser.add_argument("--index-batch", type=int, default=200, help="documents per index commit")
+    parser.add_argument("--flush-interval", type=float, default=30.0, help="max seconds between index commits")
+    parser.add_argument("--source", default=DATASET_SOURCE, help="dataset base URL or local mirror directory")
+    parser.add_argument("--offline", action="store_true", help="use only the local image cache")
+    args = parser.parse_args()
+
+    asyncio.run(ingest_manual(
+        limit=args.limit,
+        download_workers=args.download_workers,
+        ocr_workers=args.ocr_workers,
+        ocr_initial=args.ocr_initial,
+        queue_size=args.queue_size,
+        index_batch=args.index_batch,
+        flush_interval=args.flush_interval,
+        source=args.source,
+        offline=args.offline,
+    ))
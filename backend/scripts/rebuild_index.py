@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services import ocr_cache, question_store
+from app.services.gemini_ocr import MODEL_NAME, PROMPT_VERSION
+from app.services.image_cache import ImageCache
+from app.services.search_engine import replace_all_documents
+from ingest_manual import build_document, download_metadata
+
+
+def iter_cached_documents(lines, results, stats):
+    for i, line in enumerate(lines):
+        item = json.loads(line)
+        item.setdefault('question_id', f"q_{i}")
+        result = results.get(item.get('image_path') or item.get('file_name'))
+        if result is None:
+            stats["missing"] += 1
+            continue
+        yield build_document(item, result)
+
+
+def load_ocr_cache_documents(sync_db: bool = True):
+    """
+    Documents built from stored OCR results and the dataset metadata.
+    No images are downloaded and Gemini is never called, so no API key is needed.
+    """
+    lines = download_metadata(ImageCache(offline=True))
+    results = ocr_cache.results_by_image_path(MODEL_NAME, PROMPT_VERSION)
+    print(f"{len(results)} cached OCR results for {MODEL_NAME} (prompt {PROMPT_VERSION}), {len(lines)} metadata items.")
+
+    stats = {"missing": 0}
+    documents = list(iter_cached_documents(lines, results, stats))
+    if stats["missing"]:
+        print(f"{stats['missing']} items have no cached OCR result.")
+    if sync_db:
+        # Keep the question table, the source of truth, in step with the rebuilt index
+        question_store.upsert_questions(documents)
+    return documents
+
+
+def rebuild(documents, procs: int) -> float:
+    """
+    Rebuilds the index from documents with procs processes; returns docs/s.
+    """
+    start = time.perf_counter()
+    indexed = replace_all_documents(documents, procs=procs)
+    elapsed = time.perf_counter() - start
+    rate = indexed / max(elapsed, 1e-9)
+    print(f"Indexed {indexed} documents in {elapsed:.2f}s with {procs} process(es): "
+          f"{rate:.0f} docs/s, {rate / procs:.0f} docs/s per core.")
+    return rate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the search index in a staging directory and swap it in; searches keep working meanwhile.")
+    parser.add_argument("--source", choices=["ocr-cache", "db"], default="ocr-cache",
+                        help="OCR result cache joined with dataset metadata, or the question table")
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("--scaling", action="store_true",
+                        help="rebuild with 1, 2, 4, ... --procs processes and report docs/s for each")
+    args = parser.parse_args()
+
+    if args.source == "db":
+        print(f"Rebuilding from {question_store.count_questions()} questions in the database.")
+        # Streamed through a server-side cursor, once per pass
+        documents = question_store.iter_documents
+    else:
+        documents = load_ocr_cache_documents()
+
+    counts = [args.procs]
+    if args.scaling:
+        counts = sorted({min(2 ** i, args.procs) for i in range(args.procs.bit_length() + 1)})
+    rates = {procs: rebuild(documents, procs) for procs in counts}
+    if args.scaling:
+        print(json.dumps({"source": args.source, "docs_per_sec": rates,
+                          "speedup": {p: round(r / rates[counts[0]], 2) for p, r in rates.items()}}))
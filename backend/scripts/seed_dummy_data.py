@@ -7,6 +7,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.services.search_engine import add_documents
+from app.services.question_store import upsert_questions
 
 def seed_data():
     documents = [
@@ -141,6 +142,7 @@ def seed_data():
     ]
     
     print(f"Seeding {len(documents)} dummy documents...")
+    upsert_questions(documents)
     add_documents(documents)
     print("Done.")
 
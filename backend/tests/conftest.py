@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import tempfile
+import pytest
+
+# Tests run against a throwaway SQLite database and index directory, with local embeddings
+_workdir = tempfile.mkdtemp(prefix="pyq-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'pyq_test.db')}")
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("GEMINI_API_KEY", "")
+os.chdir(_workdir)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _wait_for(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+@pytest.fixture
+def wait_for():
+    """
+    wait_for(predicate, timeout=10.0): polls until predicate() is true; returns its last value.
+    """
+    return _wait_for
+
+
+@pytest.fixture
+def commit_during_rebuild(monkeypatch):
+    """
+    commit_during_rebuild(module, documents): slows module.index_vocabulary down, then
+    commits documents one by one, each landing while the background rebuild started by
+    the previous commit is still reading the index. Returns the last commit's generation.
+    """
+    from app.services.search_engine import add_documents, index_manager
+
+    def run(module, documents):
+        vocabulary = module.index_vocabulary
+
+        def slow_vocabulary(reader, *args):
+            time.sleep(0.3)
+            return vocabulary(reader, *args)
+
+        monkeypatch.setattr(module, "index_vocabulary", slow_vocabulary)
+        for position, doc in enumerate(documents):
+            if position:
+                time.sleep(0.1)
+            add_documents([doc])
+        return index_manager.generation
+    return run
@@ -0,0 +1,53 @@
+import threading
+import numpy as np
+from app.services import dedup
+from app.services.search_engine import add_documents, get_question, index_manager
+
+STEM = (
+    "An electron moving with a velocity of {v} x 10^6 m/s enters a region of uniform magnetic field of {b} T "
+    "directed perpendicular to its velocity. Neglecting gravity and any electric field present in the region, "
+    "and taking the charge of the electron as 1.6 x 10^-19 C and its mass as 9.1 x 10^-31 kg, the radius of "
+    "the circular path followed by the electron is\nOptions: {o}"
+)
+FIRST = STEM.format(v=2, b=0.5, o="22.7 um, 11.4 um, 45.5 um, 5.7 um")
+SECOND = STEM.format(v=3, b=0.2, o="85.3 um, 42.6 um, 170.6 um, 21.3 um")
+
+
+def test_questions_differing_only_in_numbers_are_not_merged(tmp_path):
+    # The wording alone is similar enough to pass the threshold
+    similarity = np.mean(dedup.signature(FIRST) == dedup.signature(SECOND))
+    assert similarity >= dedup.DEDUP_THRESHOLD
+
+    index = dedup.DedupIndex(str(tmp_path))
+    assert index.assign([{"id": "a_1", "content": FIRST}, {"id": "b_1", "content": SECOND}]) == {}
+    assert index.find_duplicate(SECOND, exclude="b_1") is None
+
+
+def test_reprint_with_the_same_numbers_is_merged(tmp_path):
+    reprint = FIRST.replace(", ", ",  ").replace("m/s", "m / s") + "."
+    index = dedup.DedupIndex(str(tmp_path))
+    assert index.assign([{"id": "a_1", "content": FIRST}]) == {}
+    assert index.assign([{"id": "b_1", "content": reprint}]) == {"b_1": "a_1"}
+    # A fresh process reads the stored fingerprints back
+    assert dedup.DedupIndex(str(tmp_path)).find_duplicate(reprint, exclude="b_1") == "a_1"
+
+
+def test_concurrent_copies_keep_every_appearance():
+    text = "A convex lens of focal length 20 cm forms a real image twice the size of the object; find the object distance."
+    add_documents([{"id": "lens_a", "content": text, "source": "paper_a", "year": "2019"}])
+
+    # Both copies are waiting on the write lock before either reads the canonical question
+    held = index_manager.writer()
+    threads = [
+        threading.Thread(target=add_documents, args=([{"id": f"lens_{name}", "content": text + " ", "source": f"paper_{name}"}],))
+        for name in ("b", "c")
+    ]
+    for thread in threads:
+        thread.start()
+    threading.Event().wait(0.5)
+    held.cancel()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    appearances = {a["id"] for a in get_question("lens_a")["appearances"]}
+    assert appearances == {"lens_a", "lens_b", "lens_c"}
@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from app.main import app
+from app.api import explain
+from app.services import explanation_cache
+
+client = TestClient(app)
+
+
+def test_explain_works_without_the_database(monkeypatch):
+    def unreachable():
+        raise OperationalError("connect", {}, Exception("connection refused"))
+
+    async def generate(question_text, options=None, correct_answer=None):
+        return "Because the incline is frictionless."
+
+    monkeypatch.setattr(explanation_cache, "get_engine", unreachable)
+    monkeypatch.setattr(explain, "generate_explanation", generate)
+    response = client.post("/api/v1/explain", json={"question_id": "q_db_down", "question_text": "Why?"})
+    assert response.status_code == 200
+    assert response.json()["explanation"] == "Because the incline is frictionless."
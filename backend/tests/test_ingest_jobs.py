@@ -0,0 +1,51 @@
+import os
+import shutil
+import threading
+from app.services import ingest_jobs
+from app.services.search_engine import index_manager
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploaded_pdfs", "solution-2504984.pdf")
+
+
+def test_concurrent_jobs_both_index(tmp_path):
+    jobs = []
+    for name in ("paper_a.pdf", "paper_b.pdf"):
+        path = tmp_path / name
+        shutil.copy(SAMPLE_PDF, path)
+        jobs.append(ingest_jobs.enqueue(name, str(path)))
+
+    # Hold the write lock until both jobs are running, so their commits overlap
+    held = index_manager.writer()
+    threads = [threading.Thread(target=ingest_jobs.process_job, args=(job,)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    threading.Event().wait(1.0)
+    held.cancel()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    # Both jobs read the same PDF, so the second one's questions are merged into the first's
+    with index_manager.searcher() as searcher:
+        seen = {a["id"] for doc in searcher.all_stored_fields() for a in doc.get("appearances") or []}
+    for job in jobs:
+        job = ingest_jobs.get_job(job.id)
+        assert job.status == "done", job.errors
+        assert job.questions_indexed > 0
+        assert len({i for i in seen if i.startswith(f"{job.filename}_")}) == job.questions_indexed
+
+
+def test_uploads_with_the_same_name_keep_their_own_file():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    paths = []
+    for body in (b"%PDF-1.4 first", b"%PDF-1.4 second"):
+        response = client.post("/api/v1/ingest", files={"file": ("paper.pdf", body, "application/pdf")})
+        assert response.status_code == 202
+        job = ingest_jobs.get_job(response.json()["job_id"])
+        assert job.filename == "paper.pdf"
+        paths.append(job.path)
+    assert paths[0] != paths[1]
+    with open(paths[0], "rb") as f:
+        assert f.read() == b"%PDF-1.4 first"
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from app.services.rate_limiter import TokenBucket, with_retries, with_retries_blocking
+
+NO_DELAY = {"base_delay": 0, "jitter": (0, 0)}
+
+
+def _flaky(errors):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    return call, calls
+
+
+def test_rate_limited_calls_are_retried():
+    call, calls = _flaky([RuntimeError("429 RESOURCE_EXHAUSTED")])
+    assert with_retries_blocking("test", call, limiter=TokenBucket(rate=1000.0, capacity=5), **NO_DELAY) == "ok"
+    assert len(calls) == 2
+
+
+def test_other_errors_are_raised_at_once():
+    call, calls = _flaky([ValueError("400 bad request")])
+    with pytest.raises(ValueError):
+        with_retries_blocking("test", call, limiter=TokenBucket(rate=1000.0, capacity=5), **NO_DELAY)
+    assert len(calls) == 1
+
+
+def test_async_retries_give_up_after_max_retries():
+    call, calls = _flaky([RuntimeError("429")] * 3)
+
+    async def request():
+        return call()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(with_retries("test", request, max_retries=3, limiter=TokenBucket(rate=1000.0, capacity=5), **NO_DELAY))
+    assert len(calls) == 3
@@ -0,0 +1,33 @@
+import os
+from whoosh.index import exists_in
+from app.services.search_engine import (IndexManager, add_documents, get_question, index_manager,
+                                        replace_all_documents, staging_path)
+
+SOURCE = [
+    {"id": "src_1", "content": "Define the coefficient of linear expansion of a solid rod."},
+    {"id": "src_2", "content": "State Lenz's law and explain it with the help of a falling magnet."},
+]
+LATE = {"id": "late_1", "content": "Explain why the sky appears blue using Rayleigh scattering of sunlight."}
+
+
+def test_commit_during_rebuild_survives_the_swap():
+    reads = []
+
+    def source():
+        reads.append(1)
+        if len(reads) == 2:
+            # An ingest job commits while the rebuild writes its second pass
+            add_documents([LATE])
+        return iter(SOURCE)
+
+    replace_all_documents(source)
+    assert get_question("late_1") is not None
+    assert get_question("src_1") is not None
+    assert get_question("src_2") is not None
+    assert not os.path.exists(staging_path(index_manager.index_dir))
+
+
+def test_manager_creates_its_own_index_dir(tmp_path):
+    manager = IndexManager(str(tmp_path / "other_index"))
+    assert manager.get_index(create=True) is not None
+    assert exists_in(manager.index_dir)
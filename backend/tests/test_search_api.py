@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import search_engine
+from app.services.query_cache import search_cache
+from app.services.search_engine import add_documents
+
+client = TestClient(app)
+
+
+PHYSICS_QUESTIONS = [
+    "A block slides down a frictionless incline of angle 30 degrees; find its acceleration.",
+    "Two charges repel each other on a frictionless incline inside a uniform electric field.",
+    "A frictionless incline carries a rolling cylinder whose moment of inertia must be found.",
+]
+
+
+def _index_physics():
+    add_documents([
+        {"id": f"case_{i}", "content": text, "tags": "Physics,2023", "year": "2023", "subject": "Physics", "source": "case_test"}
+        for i, text in enumerate(PHYSICS_QUESTIONS)
+    ])
+
+
+def test_cache_key_keeps_case():
+    _index_physics()
+    lower = client.get("/api/v1/search", params={"q": "physics", "fields": "id,subject"}).json()
+    upper = client.get("/api/v1/search", params={"q": "Physics", "fields": "id,subject"}).json()
+    assert upper["total"] >= 3
+    assert all(hit["subject"] == "Physics" for hit in upper["results"])
+    assert lower["total"] != upper["total"]
+
+
+def test_failed_search_is_not_cached(monkeypatch):
+    _index_physics()
+    search_cache.clear()
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(search_engine.spell_corrector, "correct_query", broken)
+    failed = client.get("/api/v1/search", params={"q": "frictionless incline"}).json()
+    assert failed["total"] == 0
+    monkeypatch.undo()
+
+    recovered = client.get("/api/v1/search", params={"q": "frictionless incline"}).json()
+    assert recovered["total"] >= 3
+
+
+def test_filter_without_matches_returns_empty_page():
+    _index_physics()
+    response = client.get("/api/v1/search", params={"q": "frictionless incline", "subject": "Nope"}).json()
+    assert response["results"] == []
+    assert response["total"] == 0
+    assert response["facets"]["subject"].get("Physics", 0) >= 3
+
+
+def test_facet_counts_ignore_their_own_filter():
+    _index_physics()
+    response = client.get("/api/v1/search", params={"q": "frictionless incline", "subject": "Physics"}).json()
+    assert response["total"] >= 3
+    assert response["facets"]["subject"]["Physics"] == response["total"]
+    assert response["facets"]["year"]["2023"] == response["total"]
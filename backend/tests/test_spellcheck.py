@@ -0,0 +1,48 @@
+import threading
+from app.services import spellcheck
+from app.services.rebuilder import CoalescingRebuild
+from app.services.search_engine import add_documents, spell_corrector
+
+
+def test_request_during_build_runs_again(wait_for):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+
+    rebuild = CoalescingRebuild(build, "test-rebuild")
+    rebuild.request()
+    assert started.wait(5)
+    rebuild.request()
+    rebuild.request()
+    release.set()
+    assert wait_for(lambda: len(calls) == 2 and not rebuild._running)
+
+
+def test_commit_during_rebuild_reaches_vocabulary(commit_during_rebuild, wait_for):
+    add_documents([{"id": "spell_0", "content": "Photosynthesis happens in the chloroplast", "subject": "Biology"}])
+    spell_corrector.correct_query("photosynthesis")  # builds the first table
+
+    generation = commit_during_rebuild(spellcheck, [
+        {"id": "spell_1", "content": "Glycolysis breaks down glucose", "subject": "Biology"},
+        {"id": "spell_2", "content": "Mitochondria make ATP by oxidative phosphorylation", "subject": "Biology"},
+    ])
+    assert wait_for(lambda: spell_corrector._generation == generation)
+    assert spell_corrector.correct_query("mitochondria") == "mitochondria"
+
+
+def test_years_and_subjects_are_not_corrected():
+    add_documents([
+        {"id": "year_2023", "content": "Find the focal length of a concave mirror", "tags": "Physics,2023",
+         "year": "2023", "subject": "Physics"},
+        {"id": "year_2024", "content": "Name the enzyme that fixes carbon dioxide", "tags": "Biology",
+         "year": "2024", "subject": "Zoology"},
+    ])
+    spell_corrector.rebuild()
+    assert spell_corrector.correct_query("2024") == "2024"
+    assert spell_corrector.correct_query("Zoology") == "Zoology"
+    from app.services.search_engine import search_page
+    assert [hit["id"] for hit in search_page("2024", with_facets=False)["results"]] == ["year_2024"]
@@ -0,0 +1,15 @@
+from app.services import suggest
+from app.services.search_engine import add_documents
+from app.services.suggest import suggest_index
+
+
+def test_commit_during_rebuild_reaches_suggestions(commit_during_rebuild, wait_for):
+    add_documents([{"id": "suggest_0", "content": "Refraction bends light at a boundary", "subject": "Physics"}])
+    suggest_index.rebuild()
+
+    generation = commit_during_rebuild(suggest, [
+        {"id": "suggest_1", "content": "Diffraction spreads waves past an edge", "subject": "Physics"},
+        {"id": "suggest_2", "content": "Interferometry measures tiny distances", "subject": "Physics"},
+    ])
+    assert wait_for(lambda: suggest_index._generation == generation)
+    assert [s["text"] for s in suggest_index.suggest("interferom")] == ["interferometry"]
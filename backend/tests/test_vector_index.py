@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+import pytest
+from app.services import llm, vector_index
+from app.services.rate_limiter import TokenBucket
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_content(self, model, contents, config):
+        self.calls += 1
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[0.1] * vector_index.GeminiEmbedder.dim) for _ in contents])
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    models = FakeModels()
+    monkeypatch.setattr(llm, "get_client", lambda: SimpleNamespace(models=models))
+    return models
+
+
+def test_document_embeddings_take_limiter_tokens(monkeypatch, fake_gemini):
+    limiter = TokenBucket(rate=1000.0, capacity=1)
+    monkeypatch.setattr(vector_index, "gemini_limiter", limiter)
+    texts = ["x"] * (vector_index.GEMINI_EMBED_BATCH + 1)
+    vectors = vector_index.GeminiEmbedder().embed(texts)
+    assert vectors.shape == (len(texts), vector_index.GeminiEmbedder.dim)
+    assert fake_gemini.calls == 2
+    assert limiter._tokens < 1
+
+
+def test_query_embedding_gives_up_when_its_budget_is_spent(monkeypatch, fake_gemini):
+    limiter = TokenBucket(rate=0.01, capacity=1)
+    limiter.drain()
+    monkeypatch.setattr(vector_index, "query_limiter", limiter)
+    with pytest.raises(RuntimeError):
+        vector_index.GeminiEmbedder().embed(["carnot engine"], query=True)
+    assert fake_gemini.calls == 0
+
+
+def test_query_embedding_ignores_the_shared_quota(monkeypatch, fake_gemini):
+    shared = TokenBucket(rate=0.01, capacity=1)
+    shared.drain()
+    monkeypatch.setattr(vector_index, "gemini_limiter", shared)
+    monkeypatch.setattr(vector_index, "query_limiter", TokenBucket(rate=1.0, capacity=1))
+    vector = vector_index.GeminiEmbedder().embed(["carnot engine"], query=True)
+    assert vector.shape == (1, vector_index.GeminiEmbedder.dim)
+    assert fake_gemini.calls == 1
+
+
+def test_rebuild_only_embeds_changed_questions(monkeypatch):
+    from app.services.search_engine import replace_all_documents
+    embedded = []
+    original = vector_index.embed_documents
+
+    def recording(texts):
+        embedded.extend(texts)
+        return original(texts)
+
+    monkeypatch.setattr(vector_index, "embed_documents", recording)
+    documents = [
+        {"id": "rb_1", "content": "State the second law of thermodynamics in the Kelvin-Planck form."},
+        {"id": "rb_2", "content": "Derive the expression for the escape velocity from the surface of the earth."},
+    ]
+    replace_all_documents(documents)
+    assert len(embedded) == 2
+
+    embedded.clear()
+    documents[1] = {**documents[1], "content": "Derive the orbital velocity of a satellite close to the earth's surface."}
+    replace_all_documents(documents)
+    assert embedded == [documents[1]["content"]]
+    assert {doc_id for doc_id, _ in vector_index.search("Kelvin-Planck second law", k=2)} == {"rb_1", "rb_2"}
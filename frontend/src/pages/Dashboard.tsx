@@ -1,5 +1,5 @@
-import React, { useState } from 'react';
-import { searchQuestions, ingestPDF, getExplanation } from '../services/api';
+import React, { useEffect, useState } from 'react';
+import { searchQuestions, suggestQueries, getQuestion, ingestPDF, getIngestJob, streamExplanation } from '../services/api';
 import type { SearchResult } from '../services/api';
 import ExplainDrawer from '../components/ExplainDrawer';
 import { Link } from 'react-router-dom';
@@ -8,6 +8,25 @@ function Dashboard() {
     const [query, setQuery] = useState('');
     const [results, setResults] = useState<SearchResult[]>([]);
     const [loading, setLoading] = useState(false);
+    const [suggestions, setSuggestions] = useState<string[]>([]);
+
+    // Typeahead: ask for completions shortly after typing pauses; stale responses are dropped
+    useEffect(() => {
+        if (!query.trim()) {
+            setSuggestions([]);
+            return;
+        }
+        let cancelled = false;
+        const timer = setTimeout(() => {
+            suggestQueries(query)
+                .then((items) => !cancelled && setSuggestions(items.map((s) => s.text)))
+                .catch(() => !cancelled && setSuggestions([]));
+        }, 100);
+        return () => {
+            cancelled = true;
+            clearTimeout(timer);
+        };
+    }, [query]);
 
     // Explanation State
     const [explainState, setExplainState] = useState({
@@ -24,7 +43,7 @@ function Dashboard() {
         setLoading(true);
         try {
             const data = await searchQuestions(query);
-            setResults(data);
+            setResults(data.results);
         } catch (error) {
             console.error("Search failed", error);
             // Fallback for demo if API fails
@@ -59,15 +78,25 @@ function Dashboard() {
 
         try {
             alert("Uploading " + file.name + "...");
-            await ingestPDF(file);
-            alert("Upload complete! You can now search for questions from this PDF.");
+            const { job_id } = await ingestPDF(file);
+
+            // Parsing and indexing run in the background; poll until the job finishes
+            let job = await getIngestJob(job_id);
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 2000));
+                job = await getIngestJob(job_id);
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.errors.join('; '));
+            }
+            alert(`Upload complete! Indexed ${job.questions_indexed} questions. You can now search for questions from this PDF.`);
         } catch (error) {
             console.error("Upload failed", error);
             alert("Upload failed. Check console.");
         }
     };
 
-    const handleExplain = async (id: string, text: string, options: string[] = [], correctAnswer: string = '') => {
+    const handleExplain = async (id: string, text: string = '', options: string[] = [], correctAnswer: string = '') => {
         // 1. Open Drawer immediately with loading state
         setExplainState({
             isOpen: true,
@@ -79,21 +108,33 @@ function Dashboard() {
         });
 
         try {
-            // 2. Fetch explanation
-            const explanation = await getExplanation(id, text, options, correctAnswer);
+            // Search hits only carry a snippet; load the full question first
+            if (!text) {
+                const question = await getQuestion(id);
+                text = question.content ?? '';
+                options = question.options ?? [];
+                correctAnswer = question.correct_answer ?? '';
+                setExplainState(prev => ({ ...prev, questionText: text, options, correctAnswer }));
+            }
 
-            // 3. Update state with result
-            setExplainState(prev => ({
-                ...prev,
-                isLoading: false,
-                explanation: explanation,
-            }));
+            // 2. Stream explanation, showing text as soon as the first chunk arrives
+            await streamExplanation(id, text, options, correctAnswer, (chunk) => {
+                setExplainState(prev => ({
+                    ...prev,
+                    isLoading: false,
+                    explanation: prev.explanation + chunk,
+                }));
+            });
+            setExplainState(prev => ({ ...prev, isLoading: false }));
         } catch (error) {
             console.error("Explanation failed", error);
+            const message = error instanceof Error && error.message.startsWith('Error')
+                ? error.message
+                : "Sorry, I couldn't generate an explanation at this moment. Please try again later. (This is a demo)";
             setExplainState(prev => ({
                 ...prev,
                 isLoading: false,
-                explanation: "Sorry, I couldn't generate an explanation at this moment. Please try again later. (This is a demo)",
+                explanation: message,
             }));
         }
     };
@@ -143,9 +184,15 @@ function Dashboard() {
                                 className="flex-1 p-4 border-3 border-border shadow-neo focus:outline-none focus:shadow-neo-lg transition-all bg-white placeholder-gray-400"
                                 placeholder="Search topics (e.g. 'Photosynthesis', 'Rotational Motion')..."
                                 value={query}
+                                list="search-suggestions"
                                 onChange={(e) => setQuery(e.target.value)}
                                 onKeyDown={(e) => e.key === 'Enter' && handleSearch()}
                             />
+                            <datalist id="search-suggestions">
+                                {suggestions.map((text) => (
+                                    <option key={text} value={text} />
+                                ))}
+                            </datalist>
                             <button
                                 onClick={handleSearch}
                                 disabled={loading}
@@ -174,9 +221,16 @@ function Dashboard() {
                                     </div>
                                     <span className="text-accent font-bold uppercase">{(result.score * 100).toFixed(0)}% Rel.</span>
                                 </div>
-                                <p className="text-lg mb-4 group-hover:text-primary transition-colors font-medium">
-                                    {result.content}
-                                </p>
+                                {result.snippet ? (
+                                    <p
+                                        className="text-lg mb-4 group-hover:text-primary transition-colors font-medium"
+                                        dangerouslySetInnerHTML={{ __html: result.snippet }}
+                                    />
+                                ) : (
+                                    <p className="text-lg mb-4 group-hover:text-primary transition-colors font-medium">
+                                        {result.content}
+                                    </p>
+                                )}
                                 <div className="flex justify-between items-center">
                                     <button
                                         onClick={(e) => {
@@ -12,23 +12,62 @@ export const api = axios.create({
 
 export interface SearchResult {
     id: string;
-    content: string;
     score: number;
+    // Highlighted fragments of the question: HTML-escaped, with matched terms in <mark>
+    snippet?: string;
+    // Full fields are only present when requested with `fields`, or from getQuestion
+    content?: string;
     subject?: string;
     year?: string;
     tags?: string;
     options?: string[];
     correct_answer?: string;
     explanation?: string;
+    source?: string;
+    appearances?: { id: string; source?: string; year?: string }[];
 }
 
-export const searchQuestions = async (query: string): Promise<SearchResult[]> => {
-    const response = await api.get<SearchResult[]>('/search', {
-        params: { q: query },
+export interface SearchResponse {
+    results: SearchResult[];
+    total: number;
+    page: number;
+    page_size: number;
+    facets: Record<string, Record<string, number>>;
+}
+
+export interface SearchFilters {
+    subject?: string;
+    year?: string;
+    page?: number;
+    page_size?: number;
+}
+
+export const searchQuestions = async (query: string, filters: SearchFilters = {}): Promise<SearchResponse> => {
+    const response = await api.get<SearchResponse>('/search', {
+        params: { q: query, ...filters },
     });
     return response.data;
 };
 
+export interface Suggestion {
+    text: string;
+    weight: number;
+}
+
+// Typeahead completions of the last word typed; cheap enough to call on every keystroke
+export const suggestQueries = async (query: string, limit: number = 8): Promise<Suggestion[]> => {
+    const response = await api.get<Suggestion[]>('/suggest', {
+        params: { q: query, limit },
+    });
+    return response.data;
+};
+
+// Full stored fields of one question, for the details the search results leave out
+export const getQuestion = async (questionId: string): Promise<SearchResult> => {
+    const response = await api.get<SearchResult>(`/questions/${encodeURIComponent(questionId)}`);
+    return response.data;
+};
+
 export const ingestPDF = async (file: File): Promise<any> => {
     const formData = new FormData();
     formData.append('file', file);
@@ -41,6 +80,22 @@ export const ingestPDF = async (file: File): Promise<any> => {
     return response.data;
 };
 
+export interface IngestJob {
+    id: string;
+    filename: string;
+    status: 'queued' | 'running' | 'done' | 'failed';
+    pages_total: number;
+    pages_done: number;
+    questions_found: number;
+    questions_indexed: number;
+    errors: string[];
+}
+
+export const getIngestJob = async (jobId: string): Promise<IngestJob> => {
+    const response = await api.get<IngestJob>(`/ingest/jobs/${jobId}`);
+    return response.data;
+};
+
 export const getExplanation = async (questionId: string, text: string, options: string[] = [], correctAnswer: string = ''): Promise<string> => {
     const response = await api.post('/explain', {
         question_id: questionId,
@@ -51,3 +106,80 @@ export const getExplanation = async (questionId: string, text: string, options:
     return response.data.explanation;
 };
 
+export interface BatchExplanation {
+    question_id: string;
+    explanation: string;
+    cached: boolean;
+}
+
+// Explains many questions (e.g. a whole mock test) with a few packed Gemini calls; results are in request order
+export const getExplanations = async (questions: { questionId: string; text: string; options?: string[]; correctAnswer?: string }[]): Promise<BatchExplanation[]> => {
+    const response = await api.post<{ explanations: BatchExplanation[] }>('/explain/batch', {
+        questions: questions.map(q => ({
+            question_id: q.questionId,
+            question_text: q.text,
+            options: q.options ?? [],
+            correct_answer: q.correctAnswer ?? ''
+        }))
+    });
+    return response.data.explanations;
+};
+
+// Streams an explanation over Server-Sent Events, calling onChunk with each piece of text.
+// Resolves with the full explanation once the stream ends.
+export const streamExplanation = async (
+    questionId: string,
+    text: string,
+    options: string[] = [],
+    correctAnswer: string = '',
+    onChunk: (chunk: string) => void = () => {},
+): Promise<string> => {
+    const response = await fetch(`${API_URL}/explain/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            question_id: questionId,
+            question_text: text,
+            options: options,
+            correct_answer: correctAnswer
+        }),
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Explanation stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let explanation = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            const payload = JSON.parse(data || '{}');
+
+            if (event === 'error') {
+                throw new Error(payload.detail);
+            }
+            if (event === 'message' && payload.text) {
+                explanation += payload.text;
+                onChunk(payload.text);
+            }
+        }
+    }
+    return explanation;
+};